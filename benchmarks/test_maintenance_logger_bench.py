@@ -0,0 +1,76 @@
+"""
+Benchmarks for maintenance-logger.py hot paths (pytest-benchmark)
+Uses the same mocking as the unit tests, so no database is needed
+
+Run with: pytest benchmarks/
+"""
+
+import pytest
+from unittest.mock import MagicMock, patch
+from datetime import datetime, timezone
+import sys
+import os
+import importlib.util
+
+# Import maintenance-logger.py module despite the hyphenated name
+module_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "maintenance-logger.py")
+spec = importlib.util.spec_from_file_location("maintenance_logger", module_path)
+# Share the module object with tests/ when both run in one session; a second
+# copy in sys.modules would divert the unit tests' string patch targets
+maintenance_logger = sys.modules.get('maintenance_logger')
+if maintenance_logger is None:
+    maintenance_logger = importlib.util.module_from_spec(spec)
+    sys.modules['maintenance_logger'] = maintenance_logger
+if not hasattr(maintenance_logger, 'MaintenanceLogger'):
+    spec.loader.exec_module(maintenance_logger)
+
+LIST_ROW = {
+    'time_str': '2025-11-15 12:00',
+    'maintenance_type': 'salt_replacement',
+    'description': 'Salt block replacement',
+    'qty_str': '25.000',
+    'unit': 'kg',
+    'cost_str': '15.99',
+    'notes': 'Benchmark notes',
+    'created_by': 'manual'
+}
+
+
+@pytest.fixture
+def logger(monkeypatch, tmp_path):
+    """Create a MaintenanceLogger with a mock connection"""
+    monkeypatch.setenv("DB_USER", "bench_user")
+    monkeypatch.setenv("DB_PASSWORD", "bench_password")
+    monkeypatch.setenv("MAINT_CACHE_PATH", str(tmp_path / "cache.sqlite"))
+    maintenance_logger._load_psycopg2()
+
+    logger = maintenance_logger.MaintenanceLogger()
+    logger.db_conn = MagicMock()
+    return logger
+
+
+@patch('maintenance_logger.execute_values')
+def test_bench_log_maintenance(mock_execute_values, benchmark, logger):
+    """Benchmark logging one maintenance activity, including cache invalidation"""
+    mock_execute_values.return_value = [(1, datetime(2025, 11, 15, 12, 0, 0, tzinfo=timezone.utc))]
+
+    result = benchmark(
+        logger.log_maintenance,
+        maintenance_type='salt_replacement',
+        description='Salt block replacement',
+        quantity=25.0,
+        unit='kg',
+        cost=15.99,
+    )
+
+    assert result is True
+
+
+def test_bench_list_recent_maintenance(benchmark, logger, capsys):
+    """Benchmark formatting and writing a full list page of rows"""
+    mock_cursor = logger.db_conn.cursor.return_value.__enter__.return_value
+    mock_cursor.__iter__.side_effect = lambda: iter([LIST_ROW] * maintenance_logger.LIST_ITERSIZE)
+
+    benchmark(logger.list_recent_maintenance, days=30)
+
+    assert "🔧 2025-11-15 12:00 - salt_replacement" in capsys.readouterr().out
@@ -6,22 +6,237 @@ Log maintenance activities like salt block replacement, filter changes, etc.
 
 import os
 import sys
+import time
+import json
+import sqlite3
+import shlex
 import argparse
 import logging
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import logging.handlers
+import weakref
+from contextlib import closing
+from decimal import Decimal
+from functools import partial
+from itertools import chain
 from datetime import datetime, timezone
-
-# Configure logging
+from typing import Optional
+
+# Configure logging. Records are buffered and written to stdout in bulk;
+# ERROR and above flush immediately, and logging's exit hook flushes the rest.
+LOG_BUFFER_CAPACITY = 1024
+_log_target = logging.StreamHandler(sys.stdout)
+_log_target.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+_log_buffer = logging.handlers.MemoryHandler(
+    LOG_BUFFER_CAPACITY, flushLevel=logging.ERROR, target=_log_target
+)
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
+    handlers=[_log_buffer]
 )
 logger = logging.getLogger(__name__)
 
+# psycopg2 is imported on first connect (see _load_psycopg2) so that --help
+# and argument errors return without loading it
+psycopg2 = None
+RealDictCursor = None
+ThreadedConnectionPool = None
+execute_batch = None
+execute_values = None
+
+# Rows per multi-row INSERT statement when bulk-logging maintenance
+BULK_PAGE_SIZE = 500
+# Statements per round-trip for batched statements that are not plain INSERTs
+BATCH_PAGE_SIZE = 100
+
+# Connection pool shared by all MaintenanceLogger instances in this process,
+# created lazily on first connect so long-lived callers reuse sockets
+POOL_MIN_CONN = 1
+POOL_MAX_CONN = 4
+_POOL = None
+
+# Rows fetched per network round-trip when streaming the maintenance list
+LIST_ITERSIZE = 500
+# Rows buffered before each write to stdout when printing the list
+LIST_FLUSH_ROWS = 100
+
+# CSV columns expected by bulk_import(), in order
+IMPORT_COLUMNS = (
+    'time', 'meter_id', 'maintenance_type', 'description',
+    'quantity', 'unit', 'cost', 'notes', 'created_by'
+)
+
+# Seconds a cached last-salt / last-change lookup stays valid
+CACHE_TTL = 3600
+DEFAULT_CACHE_PATH = os.path.join(
+    os.getenv('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'water-maint', 'cache.sqlite'
+)
+# Commands main() answers from the cache, without connecting, on a hit
+CACHED_COMMANDS = {'last-salt': 'last_salt', 'last-change': 'last_change'}
+# Cache files whose directory and table this process has already created
+_CACHE_READY = set()
+
+# Read queries run with EXECUTE through _execute_prepared(), which prepares
+# each one on its first use in a session, in the same round-trip as that
+# first EXECUTE. Repeated lookups over one connection (serve mode, long-lived
+# callers) are then parsed and planned only once. psycopg2 merges the EXECUTE
+# parameters into the query text client-side and sends a single
+# simple-protocol message, so there is no separate bind round-trip to avoid
+# with cursor.mogrify().
+PREPARED_STATEMENTS = {
+    'ml_last_salt': """
+        PREPARE ml_last_salt (text) AS
+        SELECT time, EXTRACT(EPOCH FROM now() - time)::int / 86400 AS days_ago,
+               description, quantity, unit, notes
+        FROM maintenance_log
+        WHERE meter_id = $1
+          AND maintenance_type = 'salt_replacement'
+        ORDER BY time DESC
+        LIMIT 1
+    """,
+    'ml_last_change': """
+        PREPARE ml_last_change (text) AS
+        SELECT time, EXTRACT(EPOCH FROM now() - time)::int / 86400 AS days_ago,
+               maintenance_type, description, quantity, unit, cost, notes
+        FROM maintenance_log
+        WHERE meter_id = $1
+        ORDER BY time DESC
+        LIMIT 1
+    """,
+    'ml_status': """
+        PREPARE ml_status (text) AS
+        (SELECT 'last_any' AS tag, time,
+                EXTRACT(EPOCH FROM now() - time)::int / 86400 AS days_ago, maintenance_type, description,
+                quantity, unit, cost, notes
+         FROM maintenance_log
+         WHERE meter_id = $1
+         ORDER BY time DESC
+         LIMIT 1)
+        UNION ALL
+        (SELECT 'last_salt' AS tag, time,
+                EXTRACT(EPOCH FROM now() - time)::int / 86400 AS days_ago, maintenance_type, description,
+                quantity, unit, cost, notes
+         FROM maintenance_log
+         WHERE meter_id = $1
+           AND maintenance_type = 'salt_replacement'
+         ORDER BY time DESC
+         LIMIT 1)
+    """,
+    # Times are truncated to whole seconds so datetime.fromisoformat() can
+    # parse them on every supported Python version; list rows carry only the
+    # formatted time_str
+    'ml_dashboard': """
+        PREPARE ml_dashboard (text, integer) AS
+        SELECT
+            (SELECT row_to_json(s) FROM (
+                SELECT date_trunc('second', time) AS time,
+                       EXTRACT(EPOCH FROM now() - time)::int / 86400 AS days_ago,
+                       description, quantity, unit, notes
+                FROM maintenance_log
+                WHERE meter_id = $1
+                  AND maintenance_type = 'salt_replacement'
+                ORDER BY time DESC
+                LIMIT 1) s) AS last_salt,
+            (SELECT row_to_json(c) FROM (
+                SELECT date_trunc('second', time) AS time,
+                       EXTRACT(EPOCH FROM now() - time)::int / 86400 AS days_ago,
+                       maintenance_type, description, quantity, unit, cost, notes
+                FROM maintenance_log
+                WHERE meter_id = $1
+                ORDER BY time DESC
+                LIMIT 1) c) AS last_change,
+            (SELECT json_agg(json_build_object(
+                        'time_str', to_char(time, 'YYYY-MM-DD HH24:MI'),
+                        'maintenance_type', maintenance_type,
+                        'description', description,
+                        'qty_str', NULLIF(quantity, 0)::text,
+                        'unit', unit,
+                        'cost_str', to_char(NULLIF(cost, 0), 'FM999999990.00'),
+                        'notes', notes,
+                        'created_by', created_by
+                    ) ORDER BY time DESC)
+             FROM maintenance_log
+             WHERE meter_id = $1
+               AND time >= NOW() - INTERVAL '1 day' * $2) AS recent
+    """,
+}
+
+# Names from PREPARED_STATEMENTS already prepared, per pooled connection
+_SESSION_PREPARED = weakref.WeakKeyDictionary()
+
+# Decode JSON numbers as Decimal, matching how NUMERIC columns arrive otherwise
+_json_loads = partial(json.loads, parse_float=Decimal)
+
+
+def _days_ago(row) -> int:
+    """Whole days since row['time'], as computed by the query when available"""
+    days_ago = row.get('days_ago')
+    if days_ago is None:
+        # Cached rows carry only the time; see _without_days_ago()
+        days_ago = (datetime.now(timezone.utc) - row['time']).days
+    return days_ago
+
+
+def _without_days_ago(row) -> dict:
+    """Copy a row for caching, leaving out days_ago as it goes stale while cached"""
+    return {key: value for key, value in row.items() if key != 'days_ago'}
+
+
+def _cache_default(value):
+    """Encode the datetime and Decimal values of a cached row as strings"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not cacheable")
+
+
+def _decode_cached_row(row: Optional[dict]) -> Optional[dict]:
+    """Turn a cached row back into one with a datetime time and Decimal amounts"""
+    row = _decode_json_row(row)
+    if row is not None:
+        for key in ('quantity', 'cost'):
+            if isinstance(row.get(key), str):
+                row[key] = Decimal(row[key])
+    return row
+
+
+def _load_psycopg2():
+    """Import psycopg2 and bind the names this module uses, once per process"""
+    global psycopg2, RealDictCursor, ThreadedConnectionPool, execute_batch, execute_values
+    if psycopg2 is not None:
+        return
+    import psycopg2.errors
+    import psycopg2.extras
+    import psycopg2.pool
+    RealDictCursor = psycopg2.extras.RealDictCursor
+    ThreadedConnectionPool = psycopg2.pool.ThreadedConnectionPool
+    execute_batch = psycopg2.extras.execute_batch
+    execute_values = psycopg2.extras.execute_values
+
+
+def close_pool():
+    """Close every pooled connection and drop the pool, e.g. before exiting"""
+    global _POOL
+    if _POOL is not None:
+        _POOL.closeall()
+        _POOL = None
+
+
+def _decode_json_row(row: Optional[dict]) -> Optional[dict]:
+    """Turn a row_to_json() object back into a row with a datetime time"""
+    if row is not None:
+        row['time'] = datetime.fromisoformat(row['time'])
+    return row
+
 
 class MaintenanceLogger:
+    """Log and query maintenance activities for a single meter
+
+    Single-row statements use cursor.execute(). Multi-row INSERTs go through
+    execute_values() (see log_maintenance_bulk()); any other statement run
+    once per row should use _execute_batch().
+    """
+
     def __init__(self):
         # Database configuration from environment variables
         self.db_host = os.getenv('DB_HOST', 'localhost')
@@ -30,176 +245,521 @@ class MaintenanceLogger:
         self.db_user = os.getenv('DB_USER')
         self.db_password = os.getenv('DB_PASSWORD')
         self.meter_id = os.getenv('METER_ID', 'default_meter')
+        self.cache_path = os.getenv('MAINT_CACHE_PATH', DEFAULT_CACHE_PATH)
+        # Lookup that log_cached() has just missed, see _cached_row()
+        self._cache_missed = None
 
         if not self.db_user or not self.db_password:
             logger.error("DB_USER and DB_PASSWORD environment variables are required")
             sys.exit(1)
 
     def connect_database(self):
-        """Connect to the database"""
+        """Connect to the database using the shared connection pool"""
+        global _POOL
+        _load_psycopg2()
         try:
-            self.db_conn = psycopg2.connect(
-                host=self.db_host,
-                port=self.db_port,
-                database=self.db_name,
-                user=self.db_user,
-                password=self.db_password,
-                cursor_factory=RealDictCursor
-            )
+            if _POOL is None:
+                _POOL = ThreadedConnectionPool(
+                    POOL_MIN_CONN,
+                    POOL_MAX_CONN,
+                    host=self.db_host,
+                    port=self.db_port,
+                    database=self.db_name,
+                    user=self.db_user,
+                    password=self.db_password,
+                    keepalives=1,
+                    keepalives_idle=30
+                )
+            self.db_conn = _POOL.getconn()
             self.db_conn.autocommit = True
             logger.info(f"Connected to database {self.db_name} on {self.db_host}")
             return True
         except psycopg2.Error as e:
             logger.error(f"Database connection failed: {e}")
+            # Do not keep a pooled connection the caller will never release
+            self.release_database()
             return False
 
+    def _execute_prepared(self, cursor, name: str, params: tuple):
+        """EXECUTE a statement from PREPARED_STATEMENTS, preparing it on first use
+
+        Only the statement being run is prepared, and the PREPARE travels in
+        the same round-trip as the EXECUTE, so a one-shot command costs no
+        more than sending the plain query. psycopg2.Error is left for the
+        caller to handle.
+        """
+        prepared = _SESSION_PREPARED.setdefault(self.db_conn, set())
+        execute_sql = f"EXECUTE {name} ({', '.join(['%s'] * len(params))})"
+        if name in prepared:
+            cursor.execute(execute_sql, params)
+            return
+
+        try:
+            cursor.execute(f"{PREPARED_STATEMENTS[name]};\n{execute_sql}", params)
+        except psycopg2.errors.DuplicatePreparedStatement:
+            # Prepared on this session by a path we did not track
+            cursor.execute(execute_sql, params)
+        prepared.add(name)
+
+    def release_database(self):
+        """Return the database connection to the shared pool"""
+        if getattr(self, 'db_conn', None) is not None and _POOL is not None:
+            _POOL.putconn(self.db_conn)
+        self.db_conn = None
+
     def log_maintenance(self, maintenance_type: str, description: str = None,
                         quantity: float = None, unit: str = None,
                         cost: float = None, notes: str = None,
                         created_by: str = 'manual'):
         """Log a maintenance activity"""
+        results = self.log_maintenance_bulk([
+            (maintenance_type, description, quantity, unit, cost, notes, created_by)
+        ])
+        if not results:
+            return False
+
+        # Plain tuple cursor on the write path: (id, time)
+        result = results[0]
+        logger.info("✅ Maintenance logged successfully!")
+        logger.info(f"   ID: {result[0]}")
+        logger.info(f"   Time: {result[1]}")
+        logger.info(f"   Type: {maintenance_type}")
+        if description:
+            logger.info(f"   Description: {description}")
+
+        return True
+
+    def log_maintenance_bulk(self, rows: list) -> Optional[list]:
+        """Log several maintenance activities with multi-row INSERTs
+
+        Each row is a (maintenance_type, description, quantity, unit, cost,
+        notes, created_by) tuple. Rows go out BULK_PAGE_SIZE per INSERT, all
+        in one transaction, so a failing page leaves no rows behind. Returns
+        the inserted (id, time) rows, or None if the insert failed.
+        """
+        argslist = [(self.meter_id,) + tuple(row) for row in rows]
+        insert_sql = """
+        INSERT INTO maintenance_log (
+            time, meter_id, maintenance_type, description,
+            quantity, unit, cost, notes, created_by
+        ) VALUES %s
+        RETURNING id, time
+        """
+
         try:
-            with self.db_conn.cursor() as cursor:
-                insert_sql = """
-                INSERT INTO maintenance_log (
-                    time, meter_id, maintenance_type, description,
-                    quantity, unit, cost, notes, created_by
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s
-                ) RETURNING id, time
-                """
-
-                cursor.execute(insert_sql, (
-                    datetime.now(timezone.utc),
-                    self.meter_id,
-                    maintenance_type,
-                    description,
-                    quantity,
-                    unit,
-                    cost,
-                    notes,
-                    created_by
-                ))
-
-                result = cursor.fetchone()
-                logger.info("✅ Maintenance logged successfully!")
-                logger.info(f"   ID: {result['id']}")
-                logger.info(f"   Time: {result['time']}")
-                logger.info(f"   Type: {maintenance_type}")
-                if description:
-                    logger.info(f"   Description: {description}")
-
-                return True
+            # Run every page in one transaction
+            self.db_conn.autocommit = False
+            try:
+                with self.db_conn, self.db_conn.cursor() as cursor:
+                    results = execute_values(
+                        cursor, insert_sql, argslist,
+                        template="(NOW(), %s, %s, %s, %s, %s, %s, %s, %s)",
+                        page_size=BULK_PAGE_SIZE,
+                        fetch=True
+                    )
+            finally:
+                self.db_conn.autocommit = True
 
         except psycopg2.Error as e:
             logger.error(f"Failed to log maintenance: {e}")
-            return False
+            return None
+
+        self._cache_invalidate(self._cache_key(""))
+        return results
+
+    def _execute_batch(self, sql: str, rows: list, page_size: int = BATCH_PAGE_SIZE):
+        """Run sql once per row of parameters, page_size statements per round-trip
+
+        cursor.rowcount is not meaningful afterwards: it only reflects the
+        last page. psycopg2.Error is left for the caller to handle.
+        """
+        with self.db_conn.cursor() as cursor:
+            execute_batch(cursor, sql, rows, page_size=page_size)
+
+    def bulk_import(self, path: str) -> Optional[int]:
+        """Import historical maintenance rows from a CSV file with COPY
+
+        The file needs a header row naming the columns in IMPORT_COLUMNS
+        order. id is left to its sequence default. Triggers and rules on
+        maintenance_log still fire. Returns the number of rows imported, or
+        None if the import failed; a failed import leaves no rows behind.
+        """
+        copy_sql = (
+            f"COPY maintenance_log ({', '.join(IMPORT_COLUMNS)}) "
+            "FROM STDIN WITH (FORMAT CSV, HEADER)"
+        )
+
+        try:
+            with open(path, newline='') as f:
+                # Run the COPY in its own transaction
+                self.db_conn.autocommit = False
+                try:
+                    with self.db_conn, self.db_conn.cursor() as cursor:
+                        cursor.copy_expert(copy_sql, f)
+                        imported = cursor.rowcount
+                finally:
+                    self.db_conn.autocommit = True
+
+        except OSError as e:
+            logger.error(f"Failed to read {path}: {e}")
+            return None
+        except psycopg2.Error as e:
+            logger.error(f"Failed to import maintenance history: {e}")
+            return None
+
+        # Imported rows may belong to any meter in this database
+        self._cache_invalidate(self._cache_scope())
+        logger.info(f"✅ Imported {imported} maintenance records from {path}")
+        return imported
 
     def list_recent_maintenance(self, days: int = 30):
-        """List recent maintenance activities"""
+        """List recent maintenance activities
+
+        Rows are streamed through a server-side cursor, so memory use stays
+        flat and output starts before the whole result set has arrived.
+        """
         try:
-            with self.db_conn.cursor() as cursor:
-                cursor.execute("""
-                    SELECT time, maintenance_type, description, quantity, unit,
-                           cost, notes, created_by
-                    FROM maintenance_log
-                    WHERE meter_id = %s
-                      AND time >= NOW() - INTERVAL '1 day' * %s
-                    ORDER BY time DESC
-                """, (self.meter_id, days))
-
-                results = cursor.fetchall()
-
-                if not results:
-                    logger.info(f"No maintenance activities found in the last {days} days.")
-                    return
-
-                logger.info(f"\n📋 Recent maintenance activities (last {days} days):")
-                logger.info("-" * 80)
-
-                for row in results:
-                    logger.info(f"🔧 {row['time'].strftime('%Y-%m-%d %H:%M')} - {row['maintenance_type']}")
-                    if row['description']:
-                        logger.info(f"   Description: {row['description']}")
-                    if row['quantity'] and row['unit']:
-                        logger.info(f"   Quantity: {row['quantity']} {row['unit']}")
-                    if row['cost']:
-                        logger.info(f"   Cost: €{row['cost']:.2f}")
-                    if row['notes']:
-                        logger.info(f"   Notes: {row['notes']}")
-                    logger.info(f"   Logged by: {row['created_by']}")
-                    logger.info("")
+            # Named cursors only live inside a transaction
+            self.db_conn.autocommit = False
+            try:
+                with self.db_conn, self.db_conn.cursor(
+                    name=f"ml_list_{os.getpid()}", cursor_factory=RealDictCursor
+                ) as cursor:
+                    cursor.itersize = LIST_ITERSIZE
+                    cursor.execute("""
+                        SELECT to_char(time, 'YYYY-MM-DD HH24:MI') AS time_str,
+                               maintenance_type, description,
+                               NULLIF(quantity, 0)::text AS qty_str, unit,
+                               to_char(NULLIF(cost, 0), 'FM999999990.00') AS cost_str,
+                               notes, created_by
+                        FROM maintenance_log
+                        WHERE meter_id = %s
+                          AND time >= NOW() - INTERVAL '1 day' * %s
+                        ORDER BY time DESC
+                    """, (self.meter_id, days))
+
+                    self._write_list(days, cursor)
+            finally:
+                self.db_conn.autocommit = True
 
         except psycopg2.Error as e:
             logger.error(f"Failed to retrieve maintenance log: {e}")
 
-    def get_last_salt_replacement(self):
-        """Get the date of the last salt block replacement"""
+    def show_dashboard(self, days: int = 30) -> bool:
+        """Show last change, last salt replacement and the recent list from one query"""
         try:
             with self.db_conn.cursor() as cursor:
-                cursor.execute("""
-                    SELECT time, description, quantity, unit, notes
-                    FROM maintenance_log
-                    WHERE meter_id = %s
-                      AND maintenance_type = 'salt_replacement'
-                    ORDER BY time DESC
-                    LIMIT 1
-                """, (self.meter_id,))
-
-                result = cursor.fetchone()
-
-                if result:
-                    days_ago = (datetime.now(timezone.utc) - result['time']).days
-                    logger.info(f"🧂 Last salt replacement: {result['time'].strftime('%Y-%m-%d %H:%M')} ({days_ago} days ago)")
-                    if result['description']:
-                        logger.info(f"   Description: {result['description']}")
-                    if result['quantity'] and result['unit']:
-                        logger.info(f"   Quantity: {result['quantity']} {result['unit']}")
-                    if result['notes']:
-                        logger.info(f"   Notes: {result['notes']}")
-                else:
-                    logger.info("🧂 No salt replacements recorded yet.")
+                psycopg2.extras.register_default_json(cursor, loads=_json_loads)
+                self._execute_prepared(cursor, 'ml_dashboard', (self.meter_id, days))
+                last_salt, last_change, recent = cursor.fetchone()
 
         except psycopg2.Error as e:
-            logger.error(f"Failed to retrieve last salt replacement: {e}")
+            logger.error(f"Failed to retrieve maintenance dashboard: {e}")
+            return False
+
+        self._log_last_change(_decode_json_row(last_change))
+        self._log_last_salt(_decode_json_row(last_salt))
+        self._write_list(days, recent or [])
+        return True
+
+    def serve(self):
+        """Run commands read from stdin, one per line, over this connection
+
+        Each line is parsed with the normal command-line parser, so
+        'last-salt' or 'list --days 60' work as they do on the command line.
+        Blank lines and lines starting with '#' are skipped.
+        """
+        for line in sys.stdin:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            try:
+                args = _PARSER.parse_args(shlex.split(line))
+            except ValueError as e:
+                logger.error(f"Could not parse command '{line}': {e}")
+                continue
+            except SystemExit:
+                # argparse has already reported the problem (or printed help)
+                continue
+
+            if args.command == 'serve':
+                logger.error("Already serving; ignoring nested 'serve'")
+            elif args.command:
+                run_command(self, args)
+            _log_buffer.flush()
+
+    def _write_list(self, days: int, rows):
+        """Write maintenance rows for the list output to stdout"""
+        rows = iter(rows)
+        first = next(rows, None)
+
+        if first is None:
+            logger.info(f"No maintenance activities found in the last {days} days.")
+            return
+
+        # Row output is user-facing text, not telemetry, so it bypasses
+        # logging and goes to stdout in batches of LIST_FLUSH_ROWS rows.
+        # Flush buffered log records first to keep output in order.
+        _log_buffer.flush()
+        parts = [
+            f"\n📋 Recent maintenance activities (last {days} days):\n",
+            "-" * 80 + "\n",
+        ]
+        for count, row in enumerate(chain([first], rows), 1):
+            parts.append(self._format_list_row(row))
+            if count % LIST_FLUSH_ROWS == 0:
+                sys.stdout.write("".join(parts))
+                parts.clear()
+        sys.stdout.write("".join(parts))
+        sys.stdout.flush()
+
+    def _format_list_row(self, row) -> str:
+        """Format one maintenance row for the list output
+
+        The timestamp, quantity and cost arrive pre-formatted as text from
+        SQL (time_str, qty_str, cost_str), so no NUMERIC is decoded to
+        Decimal. Zero quantities and costs come through as NULL.
+        """
+        lines = [f"🔧 {row['time_str']} - {row['maintenance_type']}"]
+        if row['description']:
+            lines.append(f"   Description: {row['description']}")
+        if row['qty_str'] and row['unit']:
+            lines.append(f"   Quantity: {row['qty_str']} {row['unit']}")
+        if row['cost_str']:
+            lines.append(f"   Cost: €{row['cost_str']}")
+        if row['notes']:
+            lines.append(f"   Notes: {row['notes']}")
+        lines.append(f"   Logged by: {row['created_by']}")
+        lines.append("\n")
+        return "\n".join(lines)
+
+    def get_last_salt_replacement(self):
+        """Get the date of the last salt block replacement"""
+        result = self._cached_row('last_salt')
+
+        if result is None:
+            try:
+                with self.db_conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    self._execute_prepared(cursor, 'ml_last_salt', (self.meter_id,))
+                    result = cursor.fetchone()
+
+            except psycopg2.Error as e:
+                logger.error(f"Failed to retrieve last salt replacement: {e}")
+                return
+
+            if result:
+                self._cache_set(self._cache_key('last_salt'), _without_days_ago(result))
+
+        self._log_last_salt(result)
 
     def get_last_change(self):
         """Get the most recent maintenance activity of any type"""
+        result = self._cached_row('last_change')
+
+        if result is None:
+            try:
+                with self.db_conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    self._execute_prepared(cursor, 'ml_last_change', (self.meter_id,))
+                    result = cursor.fetchone()
+
+            except psycopg2.Error as e:
+                logger.error(f"Failed to retrieve last maintenance activity: {e}")
+                return
+
+            if result:
+                self._cache_set(self._cache_key('last_change'), _without_days_ago(result))
+
+        self._log_last_change(result)
+
+    def get_status_summary(self) -> Optional[dict]:
+        """Get the last maintenance of any type and the last salt replacement in one query"""
         try:
-            with self.db_conn.cursor() as cursor:
-                cursor.execute("""
-                    SELECT time, maintenance_type, description, quantity, unit, cost, notes
-                    FROM maintenance_log
-                    WHERE meter_id = %s
-                    ORDER BY time DESC
-                    LIMIT 1
-                """, (self.meter_id,))
-
-                result = cursor.fetchone()
-
-                if result:
-                    days_ago = (datetime.now(timezone.utc) - result['time']).days
-                    time_str = result['time'].strftime('%Y-%m-%d %H:%M')
-                    logger.info(
-                        f"🔧 Last maintenance: {result['maintenance_type']} "
-                        f"on {time_str} ({days_ago} days ago)"
-                    )
-                    if result['description']:
-                        logger.info(f"   Description: {result['description']}")
-                    if result['quantity'] and result['unit']:
-                        logger.info(f"   Quantity: {result['quantity']} {result['unit']}")
-                    if result['cost']:
-                        logger.info(f"   Cost: €{result['cost']:.2f}")
-                    if result['notes']:
-                        logger.info(f"   Notes: {result['notes']}")
-                else:
-                    logger.info("🔧 No maintenance activities recorded yet.")
+            with self.db_conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                self._execute_prepared(cursor, 'ml_status', (self.meter_id,))
 
-        except psycopg2.Error as e:
-            logger.error(f"Failed to retrieve last maintenance activity: {e}")
+                summary = {'last_any': None, 'last_salt': None}
+                for row in cursor.fetchall():
+                    summary[row['tag']] = row
 
+                self._log_last_change(summary['last_any'])
+                self._log_last_salt(summary['last_salt'])
+                return summary
 
-def main():
+        except psycopg2.Error as e:
+            logger.error(f"Failed to retrieve maintenance status: {e}")
+            return None
+
+    def log_cached(self, command: str) -> bool:
+        """Log the cached result of a last-salt / last-change command
+
+        Returns False on a cache miss, and for commands that are not cached.
+        main() calls this before connecting, so a hit needs no database
+        connection at all. After a miss, the getter that runs next goes
+        straight to the database instead of asking the cache again.
+        """
+        name = CACHED_COMMANDS.get(command)
+        result = self._cached_row(name) if name else None
+        if result is None:
+            self._cache_missed = name
+            return False
+
+        if name == 'last_salt':
+            self._log_last_salt(result)
+        else:
+            self._log_last_change(result)
+        return True
+
+    def _cache_scope(self) -> str:
+        """Cache key prefix shared by every meter in this database"""
+        return f"{self.db_host}:{self.db_port}/{self.db_name}/"
+
+    def _cache_key(self, name: str) -> str:
+        """Cache key for a lookup of this meter in this database"""
+        return f"{self._cache_scope()}{self.meter_id}:{name}"
+
+    def _cached_row(self, name: str) -> Optional[dict]:
+        """Return the cached last_salt / last_change row, or None on a miss"""
+        if self._cache_missed == name:
+            # log_cached() has looked this up already
+            self._cache_missed = None
+            return None
+        return _decode_cached_row(self._cache_get(self._cache_key(name)))
+
+    def _cache_connect(self):
+        """Open the local result cache, creating it on first use in this process"""
+        if self.cache_path in _CACHE_READY:
+            return sqlite3.connect(self.cache_path)
+
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        conn = sqlite3.connect(self.cache_path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expires REAL)"
+        )
+        _CACHE_READY.add(self.cache_path)
+        return conn
+
+    def _cache_get(self, key: str):
+        """Return a cached value, or None if it is missing, expired or unreadable"""
+        try:
+            with closing(self._cache_connect()) as conn:
+                row = conn.execute(
+                    "SELECT value FROM cache WHERE key = ? AND expires > ?",
+                    (key, time.time())
+                ).fetchone()
+            return json.loads(row[0]) if row else None
+        except (sqlite3.Error, OSError, ValueError) as e:
+            # Recreate the table next time, in case the file was removed
+            _CACHE_READY.discard(self.cache_path)
+            logger.debug(f"Cache lookup failed: {e}")
+            return None
+
+    def _cache_set(self, key: str, value, ttl: int = CACHE_TTL):
+        """Store a JSON-encodable value in the local result cache"""
+        try:
+            with closing(self._cache_connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, default=_cache_default), time.time() + ttl)
+                )
+        except (sqlite3.Error, OSError) as e:
+            _CACHE_READY.discard(self.cache_path)
+            logger.debug(f"Cache store failed: {e}")
+
+    def _cache_invalidate(self, prefix: str):
+        """Drop every cached value whose key starts with prefix"""
+        try:
+            with closing(self._cache_connect()) as conn, conn:
+                conn.execute(
+                    "DELETE FROM cache WHERE substr(key, 1, length(?)) = ?",
+                    (prefix, prefix)
+                )
+        except (sqlite3.Error, OSError) as e:
+            _CACHE_READY.discard(self.cache_path)
+            logger.debug(f"Cache invalidation failed: {e}")
+
+    def _log_last_salt(self, result):
+        """Log a last salt replacement row, or that none exists"""
+        if result:
+            days_ago = _days_ago(result)
+            logger.info(f"🧂 Last salt replacement: {result['time'].strftime('%Y-%m-%d %H:%M')} ({days_ago} days ago)")
+            if result['description']:
+                logger.info(f"   Description: {result['description']}")
+            if result['quantity'] and result['unit']:
+                logger.info(f"   Quantity: {result['quantity']} {result['unit']}")
+            if result['notes']:
+                logger.info(f"   Notes: {result['notes']}")
+        else:
+            logger.info("🧂 No salt replacements recorded yet.")
+
+    def _log_last_change(self, result):
+        """Log a last maintenance row of any type, or that none exists"""
+        if result:
+            days_ago = _days_ago(result)
+            time_str = result['time'].strftime('%Y-%m-%d %H:%M')
+            logger.info(
+                f"🔧 Last maintenance: {result['maintenance_type']} "
+                f"on {time_str} ({days_ago} days ago)"
+            )
+            if result['description']:
+                logger.info(f"   Description: {result['description']}")
+            if result['quantity'] and result['unit']:
+                logger.info(f"   Quantity: {result['quantity']} {result['unit']}")
+            if result['cost']:
+                logger.info(f"   Cost: €{result['cost']:.2f}")
+            if result['notes']:
+                logger.info(f"   Notes: {result['notes']}")
+        else:
+            logger.info("🔧 No maintenance activities recorded yet.")
+
+
+def run_command(logger, args):
+    """Dispatch a parsed command to the matching MaintenanceLogger method"""
+    if args.command == 'salt':
+        description = "Salt block replacement"
+        if args.brand:
+            description += f" ({args.brand})"
+
+        logger.log_maintenance(
+            maintenance_type='salt_replacement',
+            description=description,
+            quantity=args.quantity,
+            unit='kg' if args.quantity else None,
+            cost=args.cost,
+            notes=args.notes
+        )
+
+    elif args.command == 'log':
+        logger.log_maintenance(
+            maintenance_type=args.type,
+            description=args.description,
+            quantity=args.quantity,
+            unit=args.unit,
+            cost=args.cost,
+            notes=args.notes
+        )
+
+    elif args.command == 'list':
+        logger.list_recent_maintenance(args.days)
+
+    elif args.command == 'last-salt':
+        logger.get_last_salt_replacement()
+
+    elif args.command == 'last-change':
+        logger.get_last_change()
+
+    elif args.command == 'status':
+        logger.get_status_summary()
+
+    elif args.command == 'dashboard':
+        logger.show_dashboard(args.days)
+
+    elif args.command == 'import':
+        logger.bulk_import(args.csv_path)
+
+
+def _build_parser():
+    """Build the command-line argument parser"""
     parser = argparse.ArgumentParser(description='Log water system maintenance activities')
 
     subparsers = parser.add_subparsers(dest='command', help='Available commands')
@@ -230,54 +790,52 @@ def main():
     # Last change command
     subparsers.add_parser('last-change', help='Show most recent maintenance activity of any type')
 
-    args = parser.parse_args()
+    # Status command
+    subparsers.add_parser('status', help='Show last maintenance and last salt replacement')
+
+    # Dashboard command
+    dashboard_parser = subparsers.add_parser(
+        'dashboard', help='Show last maintenance, last salt replacement and recent maintenance'
+    )
+    dashboard_parser.add_argument('--days', type=int, default=30, help='Number of days to look back (default: 30)')
+
+    # Import command
+    import_parser = subparsers.add_parser('import', help='Import maintenance history from a CSV file')
+    import_parser.add_argument('csv_path', help='CSV file with a header row: ' + ','.join(IMPORT_COLUMNS))
+
+    # Serve command
+    subparsers.add_parser('serve', help='Read commands from stdin, one per line, over one connection')
+
+    return parser
+
+
+# Built once at import; main() and serve mode both parse with it
+_PARSER = _build_parser()
+
+
+def main():
+    args = _PARSER.parse_args()
 
     if not args.command:
-        parser.print_help()
+        _PARSER.print_help()
         return
 
     logger = MaintenanceLogger()
+    if logger.log_cached(args.command):
+        return
     if not logger.connect_database():
         sys.exit(1)
 
     try:
-        if args.command == 'salt':
-            description = "Salt block replacement"
-            if args.brand:
-                description += f" ({args.brand})"
-
-            logger.log_maintenance(
-                maintenance_type='salt_replacement',
-                description=description,
-                quantity=args.quantity,
-                unit='kg' if args.quantity else None,
-                cost=args.cost,
-                notes=args.notes
-            )
-
-        elif args.command == 'log':
-            logger.log_maintenance(
-                maintenance_type=args.type,
-                description=args.description,
-                quantity=args.quantity,
-                unit=args.unit,
-                cost=args.cost,
-                notes=args.notes
-            )
-
-        elif args.command == 'list':
-            logger.list_recent_maintenance(args.days)
-
-        elif args.command == 'last-salt':
-            logger.get_last_salt_replacement()
-
-        elif args.command == 'last-change':
-            logger.get_last_change()
+        if args.command == 'serve':
+            logger.serve()
+        else:
+            run_command(logger, args)
 
     finally:
-        # Ensure database connection is properly closed
-        if hasattr(logger, 'db_conn') and logger.db_conn:
-            logger.db_conn.close()
+        # Disconnect cleanly instead of dropping the pooled sockets on exit
+        logger.release_database()
+        close_pool()
 
 
 if __name__ == "__main__":
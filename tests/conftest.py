@@ -0,0 +1,41 @@
+"""
+Shared pytest fixtures for the water-python-api tests
+"""
+
+from contextlib import nullcontext
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+
+class _StubConnection(SimpleNamespace):
+    """SimpleNamespace that is hashable and weakly referenceable, like a connection"""
+
+    __hash__ = object.__hash__
+
+
+def _make_cursor_stub(fetchone=None, fetchall=None, exec_side=None):
+    """Build a (connection, cursor) pair of plain stubs
+
+    conn.cursor(...) works as a context manager yielding the cursor, and
+    cursor.execute is a MagicMock so calls can still be asserted. Tests that
+    need conn.cursor call assertions, or the connection itself as a context
+    manager, should keep using MagicMock.
+    """
+    cursor = SimpleNamespace(
+        execute=MagicMock(side_effect=exec_side),
+        fetchone=lambda: fetchone,
+        fetchall=lambda: fetchall or [],
+    )
+    conn = _StubConnection(
+        autocommit=True,
+        cursor=lambda *args, **kwargs: nullcontext(cursor),
+    )
+    return conn, cursor
+
+
+@pytest.fixture
+def make_cursor_stub():
+    """Factory for cheap connection/cursor stubs, see _make_cursor_stub()"""
+    return _make_cursor_stub
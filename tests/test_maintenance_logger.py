@@ -6,466 +6,1048 @@ Uses mocking to avoid dependencies on actual database
 import pytest
 from unittest.mock import MagicMock, patch
 from datetime import datetime, timezone
-import psycopg2
+from decimal import Decimal
+from contextlib import closing
+import io
+import re
+import copy
 import sys
 import os
+import subprocess
+import time
 import importlib.util
-
-# Import maintenance-logger.py module despite the hyphenated name
+import logging.handlers
+
+pytestmark = pytest.mark.unit
+
+# Timestamps shared by the mocked query results
+T_OCT31_0950 = datetime(2025, 10, 31, 9, 50, 0, tzinfo=timezone.utc)
+T_NOV15_1200 = datetime(2025, 11, 15, 12, 0, 0, tzinfo=timezone.utc)
+T_NOV15_1631 = datetime(2025, 11, 15, 16, 31, 0, tzinfo=timezone.utc)
+
+# SQL shape checks, tolerant of how the queries are wrapped and indented
+_RX_INTERVAL = re.compile(r"\bINTERVAL\s+'1 day'\s*\*\s*%s")
+_RX_ORDER_BY = re.compile(r'\bORDER\s+BY\s+time\s+DESC\b')
+_RX_LIMIT_1 = re.compile(r'\bLIMIT\s+1\b')
+_RX_UNION_ALL = re.compile(r'\bUNION\s+ALL\b')
+_RX_TYPE_FILTER = re.compile(r'\bmaintenance_type\s*=')
+_RX_SALT_FILTER = re.compile(r"\bmaintenance_type\s*=\s*'salt_replacement'")
+
+# Import maintenance-logger.py module despite the hyphenated name. The spec
+# uses a SourceFileLoader, so compiled bytecode is cached in __pycache__ like
+# any other import (unless PYTHONDONTWRITEBYTECODE is set).
 module_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "maintenance-logger.py")
 spec = importlib.util.spec_from_file_location("maintenance_logger", module_path)
-maintenance_logger = importlib.util.module_from_spec(spec)
-sys.modules['maintenance_logger'] = maintenance_logger
+# Reuse the module object if benchmarks/ registered it first, so string patch
+# targets such as 'maintenance_logger.execute_values' reach the same object
+maintenance_logger = sys.modules.get('maintenance_logger')
+if maintenance_logger is None:
+    maintenance_logger = importlib.util.module_from_spec(spec)
+    sys.modules['maintenance_logger'] = maintenance_logger
+
+
+@pytest.fixture(scope="session", autouse=True)
+def load_module():
+    """Execute maintenance-logger.py once for the whole test session
+
+    Configuration is read from the environment in MaintenanceLogger.__init__,
+    so tests change it with monkeypatch instead of re-executing the module.
+    """
+    if not hasattr(maintenance_logger, 'MaintenanceLogger'):
+        spec.loader.exec_module(maintenance_logger)
+    return maintenance_logger
+
 
-# Set minimal environment variables to allow module loading
-os.environ.setdefault("DB_USER", "test_user")
-os.environ.setdefault("DB_PASSWORD", "test_password")
+TEST_ENV = {
+    "DB_USER": "test_user",
+    "DB_PASSWORD": "test_password",
+    "DB_HOST": "test_host",
+    "DB_PORT": "5432",
+    "DB_NAME": "test_db",
+    "METER_ID": "test_meter",
+}
 
-# Load the module initially
-spec.loader.exec_module(maintenance_logger)
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_env():
+    """Export TEST_ENV once for the module; tests that vary it use monkeypatch"""
+    with pytest.MonkeyPatch.context() as mp:
+        for name, value in TEST_ENV.items():
+            mp.setenv(name, value)
+        yield
 
 
 @pytest.fixture(autouse=True)
-def setup_env(monkeypatch):
-    """Set up environment variables for all tests"""
-    monkeypatch.setenv("DB_USER", "test_user")
-    monkeypatch.setenv("DB_PASSWORD", "test_password")
-    monkeypatch.setenv("DB_HOST", "test_host")
-    monkeypatch.setenv("DB_PORT", "5432")
-    monkeypatch.setenv("DB_NAME", "test_db")
-    monkeypatch.setenv("METER_ID", "test_meter")
+def cache_path_env(monkeypatch, tmp_path):
+    """Give every test its own result cache file"""
+    monkeypatch.setenv("MAINT_CACHE_PATH", str(tmp_path / "cache.sqlite"))
 
 
-@pytest.fixture
-def logger():
-    """Create a MaintenanceLogger instance"""
-    return maintenance_logger.MaintenanceLogger()
+@pytest.fixture(autouse=True)
+def reset_pool(monkeypatch):
+    """Start every test without a shared connection pool"""
+    monkeypatch.setattr(maintenance_logger, "_POOL", None)
 
 
-@pytest.mark.unit
-class TestMaintenanceLoggerInit:
-    """Test logger initialization"""
+@pytest.fixture(autouse=True)
+def load_psycopg2():
+    """Bind the lazily imported psycopg2 names, as connect_database() would"""
+    maintenance_logger._load_psycopg2()
 
-    def test_init_with_env_vars(self, logger):
-        """Test initialization with environment variables"""
-        assert logger.db_user == "test_user"
-        assert logger.db_password == "test_password"
-        assert logger.db_host == "test_host"
-        assert logger.db_port == 5432
-        assert logger.db_name == "test_db"
-        assert logger.meter_id == "test_meter"
 
-    def test_init_defaults(self, monkeypatch):
-        """Test initialization with default values"""
-        monkeypatch.setenv("DB_USER", "user")
-        monkeypatch.setenv("DB_PASSWORD", "pass")
-        monkeypatch.delenv("DB_HOST", raising=False)
-        monkeypatch.delenv("METER_ID", raising=False)
+@pytest.fixture(autouse=True)
+def mock_connect(monkeypatch):
+    """Replace psycopg2.connect so no test can reach a real database"""
+    import psycopg2
+    connect = MagicMock()
+    monkeypatch.setattr(psycopg2, 'connect', connect)
+    return connect
 
-        spec.loader.exec_module(maintenance_logger)
-        logger = maintenance_logger.MaintenanceLogger()
 
-        assert logger.db_host == "localhost"
-        assert logger.meter_id == "default_meter"
+@pytest.fixture(scope="module")
+def _base_logger(setup_env):
+    """Create one MaintenanceLogger for the module, built from TEST_ENV"""
+    return maintenance_logger.MaintenanceLogger()
 
-    def test_init_without_credentials_exits(self, monkeypatch):
-        """Test that initialization fails without credentials"""
-        monkeypatch.delenv("DB_USER", raising=False)
-        monkeypatch.delenv("DB_PASSWORD", raising=False)
 
-        spec.loader.exec_module(maintenance_logger)
-        with pytest.raises(SystemExit):
-            maintenance_logger.MaintenanceLogger()
-
-
-@pytest.mark.unit
-class TestDatabaseConnection:
-    """Test database connection"""
-
-    @patch('psycopg2.connect')
-    def test_connect_database_success(self, mock_connect, logger):
-        """Test successful database connection"""
-        mock_conn = MagicMock()
-        mock_connect.return_value = mock_conn
-
-        result = logger.connect_database()
-
-        assert result is True
-        assert logger.db_conn == mock_conn
-        assert mock_conn.autocommit is True
-        mock_connect.assert_called_once_with(
-            host=logger.db_host,
-            port=logger.db_port,
-            database=logger.db_name,
-            user=logger.db_user,
-            password=logger.db_password,
-            cursor_factory=psycopg2.extras.RealDictCursor
-        )
+@pytest.fixture
+def logger(_base_logger, tmp_path):
+    """Hand each test its own shallow copy of the module's MaintenanceLogger
 
-    @patch('psycopg2.connect')
-    def test_connect_database_failure(self, mock_connect, logger):
-        """Test database connection failure"""
-        mock_connect.side_effect = psycopg2.Error("Connection failed")
+    Tests replace attributes such as db_conn on the copy only. The cache
+    file is per test, so cached lookups never leak between tests.
+    """
+    logger = copy.copy(_base_logger)
+    logger.cache_path = str(tmp_path / "cache.sqlite")
+    return logger
 
-        result = logger.connect_database()
 
-        assert result is False
+@pytest.fixture
+def mock_cursor(logger):
+    """Give logger a mock connection and return the cursor its `with` blocks yield
 
+    Built fresh for every test: shallow copies of a MagicMock share their
+    child mocks, so a copied template would leak calls between tests.
+    """
+    logger.db_conn = MagicMock()
+    return logger.db_conn.cursor.return_value.__enter__.return_value
 
-@pytest.mark.unit
-class TestLogMaintenance:
-    """Test logging maintenance activities"""
 
-    def test_log_maintenance_success(self, logger):
-        """Test successful maintenance logging"""
-        mock_cursor = MagicMock()
-        logger.db_conn = MagicMock()
-        logger.db_conn.cursor.return_value.__enter__.return_value = mock_cursor
+# Test logger initialization
 
-        # Mock the fetchone return value
-        mock_cursor.fetchone.return_value = {
-            'id': 1,
-            'time': datetime(2025, 11, 15, 12, 0, 0, tzinfo=timezone.utc)
-        }
+def test_init_with_env_vars(logger):
+    """Test initialization with environment variables"""
+    assert logger.db_user == "test_user"
+    assert logger.db_password == "test_password"
+    assert logger.db_host == "test_host"
+    assert logger.db_port == 5432
+    assert logger.db_name == "test_db"
+    assert logger.meter_id == "test_meter"
 
-        result = logger.log_maintenance(
-            maintenance_type='salt_replacement',
-            description='Test salt replacement',
-            quantity=25.0,
-            unit='kg',
-            cost=15.99,
-            notes='Test notes'
-        )
 
-        assert result is True
-        mock_cursor.execute.assert_called_once()
+def test_init_defaults(monkeypatch):
+    """Test initialization with default values"""
+    monkeypatch.setenv("DB_USER", "user")
+    monkeypatch.setenv("DB_PASSWORD", "pass")
+    monkeypatch.delenv("DB_HOST", raising=False)
+    monkeypatch.delenv("METER_ID", raising=False)
 
-    def test_log_maintenance_minimal_fields(self, logger):
-        """Test logging with only required fields"""
-        mock_cursor = MagicMock()
-        logger.db_conn = MagicMock()
-        logger.db_conn.cursor.return_value.__enter__.return_value = mock_cursor
+    logger = maintenance_logger.MaintenanceLogger()
 
-        mock_cursor.fetchone.return_value = {
-            'id': 2,
-            'time': datetime(2025, 11, 15, 12, 0, 0, tzinfo=timezone.utc)
-        }
+    assert logger.db_host == "localhost"
+    assert logger.meter_id == "default_meter"
 
-        result = logger.log_maintenance(
-            maintenance_type='inspection'
-        )
 
-        assert result is True
+def test_init_without_credentials_exits(monkeypatch):
+    """Test that initialization fails without credentials"""
+    monkeypatch.delenv("DB_USER", raising=False)
+    monkeypatch.delenv("DB_PASSWORD", raising=False)
 
-    def test_log_maintenance_database_error(self, logger):
-        """Test logging failure due to database error"""
-        logger.db_conn = MagicMock()
-        logger.db_conn.cursor.return_value.__enter__.return_value.execute.side_effect = \
-            psycopg2.Error("Insert failed")
+    with pytest.raises(SystemExit):
+        maintenance_logger.MaintenanceLogger()
 
-        result = logger.log_maintenance(
-            maintenance_type='filter_change'
-        )
 
-        assert result is False
-
-
-@pytest.mark.unit
-class TestListRecentMaintenance:
-    """Test listing recent maintenance"""
-
-    def test_list_recent_maintenance_with_results(self, logger):
-        """Test listing maintenance when results exist"""
-        mock_cursor = MagicMock()
-        logger.db_conn = MagicMock()
-        logger.db_conn.cursor.return_value.__enter__.return_value = mock_cursor
-
-        # Mock maintenance entries
-        mock_cursor.fetchall.return_value = [
-            {
-                'time': datetime(2025, 11, 15, 12, 0, 0, tzinfo=timezone.utc),
-                'maintenance_type': 'salt_replacement',
-                'description': 'Salt block replacement',
-                'quantity': 25.0,
-                'unit': 'kg',
-                'cost': 15.99,
-                'notes': 'Test notes',
-                'created_by': 'manual'
-            },
-            {
-                'time': datetime(2025, 11, 10, 10, 0, 0, tzinfo=timezone.utc),
-                'maintenance_type': 'filter_change',
-                'description': 'Main filter',
-                'quantity': None,
-                'unit': None,
-                'cost': 45.00,
-                'notes': None,
-                'created_by': 'manual'
-            }
-        ]
+# Test buffered log output
 
+def test_log_records_are_buffered():
+    """Test that records go through a MemoryHandler that flushes on errors"""
+    buffer = maintenance_logger._log_buffer
+    assert isinstance(buffer, logging.handlers.MemoryHandler)
+    assert buffer.capacity == maintenance_logger.LOG_BUFFER_CAPACITY
+    assert buffer.flushLevel == logging.ERROR
+    assert buffer.target is maintenance_logger._log_target
+
+
+def test_list_flushes_log_buffer_before_output(logger, mock_cursor):
+    """Test that pending log records are written before the list rows"""
+    mock_cursor.__iter__.return_value = iter([{
+        'time_str': '2025-11-15 12:00',
+        'maintenance_type': 'inspection',
+        'description': None,
+        'qty_str': None,
+        'unit': None,
+        'cost_str': None,
+        'notes': None,
+        'created_by': 'manual'
+    }])
+
+    with patch.object(maintenance_logger._log_buffer, 'flush') as mock_flush:
         logger.list_recent_maintenance(days=30)
 
-        mock_cursor.execute.assert_called_once()
-        # Verify the SQL uses parameterized query
-        call_args = mock_cursor.execute.call_args
-        assert 'INTERVAL' in call_args[0][0]
-        assert call_args[0][1] == (logger.meter_id, 30)
+    mock_flush.assert_called_once()
 
-    def test_list_recent_maintenance_no_results(self, logger):
-        """Test listing when no maintenance found"""
-        mock_cursor = MagicMock()
-        logger.db_conn = MagicMock()
-        logger.db_conn.cursor.return_value.__enter__.return_value = mock_cursor
 
-        mock_cursor.fetchall.return_value = []
+# Test database connection
 
-        logger.list_recent_maintenance(days=7)
+def test_connect_database_success(mock_connect, logger):
+    """Test successful database connection"""
+    mock_conn = MagicMock()
+    mock_connect.return_value = mock_conn
 
-        mock_cursor.execute.assert_called_once()
+    result = logger.connect_database()
 
-    def test_list_recent_maintenance_database_error(self, logger):
-        """Test listing with database error"""
-        logger.db_conn = MagicMock()
-        logger.db_conn.cursor.return_value.__enter__.return_value.execute.side_effect = \
-            psycopg2.Error("Query failed")
+    assert result is True
+    assert logger.db_conn == mock_conn
+    assert mock_conn.autocommit is True
+    assert mock_connect.call_count == 1
+    args, kwargs = mock_connect.call_args
+    assert args == ()
+    assert kwargs == {
+        'host': logger.db_host,
+        'port': logger.db_port,
+        'database': logger.db_name,
+        'user': logger.db_user,
+        'password': logger.db_password,
+        'keepalives': 1,
+        'keepalives_idle': 30,
+    }
 
-        # Should not raise exception, just log error
-        logger.list_recent_maintenance(days=30)
 
+def test_execute_prepared_prepares_on_first_use(logger, mock_cursor):
+    """Test that only the statement run is prepared, together with its first EXECUTE"""
+    logger._execute_prepared(mock_cursor, 'ml_last_salt', ('test_meter',))
+    logger._execute_prepared(mock_cursor, 'ml_last_salt', ('test_meter',))
+
+    first, second = [c[0] for c in mock_cursor.execute.call_args_list]
+    assert 'PREPARE ml_last_salt' in first[0]
+    assert first[0].endswith('EXECUTE ml_last_salt (%s)')
+    assert 'PREPARE ml_last_change' not in first[0]
+    assert first[1] == ('test_meter',)
+    assert second == ('EXECUTE ml_last_salt (%s)', ('test_meter',))
+
+
+def test_execute_prepared_per_connection(logger, make_cursor_stub):
+    """Test that a different pooled session prepares the statement again"""
+    for _ in range(2):
+        logger.db_conn, cursor = make_cursor_stub()
+        logger._execute_prepared(cursor, 'ml_status', ('test_meter',))
+        assert 'PREPARE ml_status' in cursor.execute.call_args[0][0]
+
+
+def test_execute_prepared_already_prepared(logger, mock_cursor):
+    """Test that a statement prepared outside the tracking is executed as is"""
+    import psycopg2.errors
+    mock_cursor.execute.side_effect = [psycopg2.errors.DuplicatePreparedStatement(), None, None]
+
+    logger._execute_prepared(mock_cursor, 'ml_last_change', ('test_meter',))
 
-@pytest.mark.unit
-class TestGetLastSaltReplacement:
-    """Test getting last salt replacement"""
+    assert mock_cursor.execute.call_args[0] == ('EXECUTE ml_last_change (%s)', ('test_meter',))
+    logger._execute_prepared(mock_cursor, 'ml_last_change', ('test_meter',))
+    assert mock_cursor.execute.call_count == 3
 
-    def test_get_last_salt_replacement_exists(self, logger):
-        """Test when salt replacement exists"""
-        mock_cursor = MagicMock()
-        logger.db_conn = MagicMock()
-        logger.db_conn.cursor.return_value.__enter__.return_value = mock_cursor
 
-        # Mock salt replacement 15 days ago
-        past_time = datetime(2025, 10, 31, 9, 50, 0, tzinfo=timezone.utc)
-        mock_cursor.fetchone.return_value = {
-            'time': past_time,
+def test_connect_database_sends_no_statements(mock_connect, logger):
+    """Test that connecting does not probe or prepare anything up front"""
+    mock_conn = MagicMock()
+    mock_connect.return_value = mock_conn
+
+    assert logger.connect_database() is True
+
+    mock_conn.cursor.assert_not_called()
+
+
+def test_connect_database_failure_returns_connection(mock_connect, logger):
+    """Test that a connect failing after getconn() hands the connection back"""
+    import psycopg2
+    mock_conn = MagicMock()
+    mock_conn.closed = False
+    mock_conn.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    type(mock_conn).autocommit = property(
+        lambda self: True, MagicMock(side_effect=psycopg2.InterfaceError("connection already closed"))
+    )
+    mock_connect.return_value = mock_conn
+
+    assert logger.connect_database() is False
+
+    assert logger.db_conn is None
+    assert mock_conn in maintenance_logger._POOL._pool
+
+
+def test_connect_database_reuses_pool(mock_connect, logger):
+    """Test that repeated connects reuse the pooled connection"""
+    import psycopg2
+    mock_conn = MagicMock()
+    mock_conn.closed = False
+    mock_conn.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    mock_connect.return_value = mock_conn
+
+    assert logger.connect_database() is True
+    logger.release_database()
+    assert logger.db_conn is None
+
+    assert logger.connect_database() is True
+    assert logger.db_conn == mock_conn
+    assert mock_connect.call_count == 1
+
+
+def test_connect_database_failure(mock_connect, logger):
+    """Test database connection failure"""
+    import psycopg2
+    mock_connect.side_effect = psycopg2.Error("Connection failed")
+
+    result = logger.connect_database()
+
+    assert result is False
+
+
+# Test logging maintenance activities
+
+@pytest.mark.parametrize("kwargs,expected_row", [
+    (
+        dict(maintenance_type='salt_replacement', description='Test salt replacement',
+             quantity=25.0, unit='kg', cost=15.99, notes='Test notes'),
+        ('salt_replacement', 'Test salt replacement', 25.0, 'kg', 15.99, 'Test notes', 'manual'),
+    ),
+    (
+        dict(maintenance_type='inspection'),
+        ('inspection', None, None, None, None, None, 'manual'),
+    ),
+], ids=['all_fields', 'minimal_fields'])
+@patch('maintenance_logger.execute_values')
+def test_log_maintenance_success(mock_execute_values, logger, kwargs, expected_row):
+    """Test successful maintenance logging"""
+    logger.db_conn = MagicMock()
+
+    # Mock the inserted (id, time) row returned by execute_values
+    mock_execute_values.return_value = [
+        (1, T_NOV15_1200)
+    ]
+
+    result = logger.log_maintenance(**kwargs)
+
+    assert result is True
+    mock_execute_values.assert_called_once()
+    # Write path uses the default tuple cursor
+    assert logger.db_conn.cursor.call_count == 1
+    assert logger.db_conn.cursor.call_args == ((), {})
+    argslist = mock_execute_values.call_args[0][2]
+    assert argslist[0] == (logger.meter_id,) + expected_row
+
+
+@patch('maintenance_logger.execute_values')
+def test_log_maintenance_bulk_single_statement(mock_execute_values, logger):
+    """Test that bulk logging sends all rows through one execute_values call"""
+    logger.db_conn = MagicMock()
+    rows = [
+        ('salt_replacement', 'Salt block replacement', 25.0, 'kg', 15.99, None, 'import'),
+        ('filter_change', 'Main filter', None, None, 45.00, None, 'import'),
+    ]
+    mock_execute_values.return_value = [(1, None), (2, None)]
+
+    results = logger.log_maintenance_bulk(rows)
+
+    assert len(results) == 2
+    mock_execute_values.assert_called_once()
+    args, kwargs = mock_execute_values.call_args
+    assert 'VALUES %s' in args[1]
+    assert [row[1:] for row in args[2]] == rows
+    assert kwargs['template'].startswith('(NOW(),')
+    assert kwargs['page_size'] == maintenance_logger.BULK_PAGE_SIZE
+    assert kwargs['fetch'] is True
+    logger.db_conn.__enter__.assert_called_once()
+    assert logger.db_conn.autocommit is True
+
+
+def test_log_maintenance_bulk_failed_page_rolls_back(logger, mock_cursor):
+    """Test that a failure on a later page rolls back the pages before it"""
+    import psycopg2
+    mock_cursor.connection.encoding = 'UTF8'
+    mock_cursor.mogrify.side_effect = lambda template, args: b"(...)"
+    mock_cursor.execute.side_effect = [None, psycopg2.Error("page 2 failed")]
+    mock_cursor.fetchall.return_value = [(1, T_NOV15_1200)]
+    logger._cache_set(logger._cache_key('last_salt'), {'a': 1})
+    rows = [('salt_replacement', None, 25.0, 'kg', None, None, 'import')] * (maintenance_logger.BULK_PAGE_SIZE + 1)
+
+    assert logger.log_maintenance_bulk(rows) is None
+
+    assert mock_cursor.execute.call_count == 2
+    # The transaction block saw the error, so psycopg2 rolls it back
+    exc_type = logger.db_conn.__exit__.call_args[0][0]
+    assert issubclass(exc_type, psycopg2.Error)
+    assert logger.db_conn.autocommit is True
+    # Nothing was saved, so the cached lookups still hold
+    assert logger._cache_get(logger._cache_key('last_salt')) == {'a': 1}
+
+
+@patch('maintenance_logger.execute_batch')
+def test_execute_batch_pages_statements(mock_execute_batch, logger, mock_cursor):
+    """Test that batched statements are handed to execute_batch with a page size"""
+    rows = [('checked', 1), ('checked', 2)]
+
+    logger._execute_batch("UPDATE maintenance_log SET notes = %s WHERE id = %s", rows)
+
+    assert mock_execute_batch.call_count == 1
+    args, kwargs = mock_execute_batch.call_args
+    assert args == (mock_cursor, "UPDATE maintenance_log SET notes = %s WHERE id = %s", rows)
+    assert kwargs == {'page_size': maintenance_logger.BATCH_PAGE_SIZE}
+
+
+# Test importing maintenance history with COPY
+
+def test_bulk_import_success(logger, tmp_path, mock_cursor):
+    """Test that the CSV is streamed through COPY in one transaction"""
+    csv_path = tmp_path / "history.csv"
+    csv_path.write_text(
+        "time,meter_id,maintenance_type,description,quantity,unit,cost,notes,created_by\n"
+        "2024-01-05 10:00:00+00,test_meter,salt_replacement,,25,kg,12.50,,import\n"
+    )
+    mock_cursor.rowcount = 1
+    other_key = logger._cache_scope() + "other_meter:last_salt"
+    logger._cache_set(other_key, {'a': 1})
+
+    assert logger.bulk_import(str(csv_path)) == 1
+
+    copy_sql = mock_cursor.copy_expert.call_args[0][0]
+    assert copy_sql.startswith("COPY maintenance_log (time, meter_id,")
+    assert "id," not in copy_sql.replace("meter_id,", "")
+    assert "FORMAT CSV, HEADER" in copy_sql
+    logger.db_conn.__enter__.assert_called_once()
+    assert logger.db_conn.autocommit is True
+    assert logger._cache_get(other_key) is None
+
+
+def test_bulk_import_missing_file(logger, tmp_path):
+    """Test that an unreadable file is reported, not raised"""
+    logger.db_conn = MagicMock()
+
+    assert logger.bulk_import(str(tmp_path / "missing.csv")) is None
+    logger.db_conn.cursor.assert_not_called()
+
+
+def test_bulk_import_database_error(logger, tmp_path):
+    """Test that a failed COPY returns None and restores autocommit"""
+    import psycopg2
+    csv_path = tmp_path / "history.csv"
+    csv_path.write_text("time\n")
+    logger.db_conn = MagicMock()
+    logger.db_conn.cursor.return_value.__enter__.return_value.copy_expert.side_effect = \
+        psycopg2.Error("bad input")
+
+    assert logger.bulk_import(str(csv_path)) is None
+    assert logger.db_conn.autocommit is True
+
+
+# Test listing recent maintenance
+
+def test_list_recent_maintenance_with_results(logger, capsys, mock_cursor):
+    """Test listing maintenance when results exist"""
+    import psycopg2.extras
+    # Mock maintenance entries streamed from the server-side cursor
+    mock_cursor.__iter__.return_value = iter([
+        {
+            'time_str': '2025-11-15 12:00',
+            'maintenance_type': 'salt_replacement',
             'description': 'Salt block replacement',
-            'quantity': 25.0,
+            'qty_str': '25.000',
             'unit': 'kg',
-            'notes': 'Test notes'
+            'cost_str': '15.99',
+            'notes': 'Test notes',
+            'created_by': 'manual'
+        },
+        {
+            'time_str': '2025-11-10 10:00',
+            'maintenance_type': 'filter_change',
+            'description': 'Main filter',
+            'qty_str': None,
+            'unit': None,
+            'cost_str': '45.00',
+            'notes': None,
+            'created_by': 'manual'
         }
+    ])
 
-        logger.get_last_salt_replacement()
+    logger.list_recent_maintenance(days=30)
 
-        mock_cursor.execute.assert_called_once()
-        # Verify query filters by salt_replacement
-        call_args = mock_cursor.execute.call_args
-        assert 'salt_replacement' in call_args[0][0]
+    mock_cursor.execute.assert_called_once()
+    # Verify the SQL uses parameterized query
+    call_args = mock_cursor.execute.call_args
+    assert _RX_INTERVAL.search(call_args[0][0])
+    assert "to_char(time, 'YYYY-MM-DD HH24:MI') AS time_str" in call_args[0][0]
+    assert call_args[0][1] == (logger.meter_id, 30)
+    # Verify rows are streamed through a named cursor in a transaction
+    assert 'name' in logger.db_conn.cursor.call_args[1]
+    assert logger.db_conn.cursor.call_args[1]['cursor_factory'] is psycopg2.extras.RealDictCursor
+    assert mock_cursor.itersize == maintenance_logger.LIST_ITERSIZE
+    assert logger.db_conn.autocommit is True
+
+    output = capsys.readouterr().out
+    assert "🔧 2025-11-15 12:00 - salt_replacement" in output
+    assert "to_char(NULLIF(cost, 0), 'FM999999990.00') AS cost_str" in call_args[0][0]
+    assert "   Quantity: 25.000 kg" in output
+    assert "   Cost: €45.00" in output
+    assert output.count("   Logged by: manual\n\n") == 2
 
-    def test_get_last_salt_replacement_not_found(self, logger):
-        """Test when no salt replacement found"""
-        mock_cursor = MagicMock()
-        logger.db_conn = MagicMock()
-        logger.db_conn.cursor.return_value.__enter__.return_value = mock_cursor
 
-        mock_cursor.fetchone.return_value = None
+def test_list_recent_maintenance_no_results(logger, mock_cursor):
+    """Test listing when no maintenance found"""
+    mock_cursor.__iter__.return_value = iter([])
 
-        logger.get_last_salt_replacement()
+    logger.list_recent_maintenance(days=7)
 
-        mock_cursor.execute.assert_called_once()
+    mock_cursor.execute.assert_called_once()
 
-    def test_get_last_salt_replacement_database_error(self, logger):
-        """Test with database error"""
-        logger.db_conn = MagicMock()
-        logger.db_conn.cursor.return_value.__enter__.return_value.execute.side_effect = \
-            psycopg2.Error("Query failed")
 
-        # Should not raise exception
-        logger.get_last_salt_replacement()
+# Test getting last salt replacement
 
+def test_get_last_salt_replacement_exists(logger, mock_cursor):
+    """Test when salt replacement exists"""
+    import psycopg2.extras
+    # Mock salt replacement 15 days ago
+    mock_cursor.fetchone.return_value = {
+        'time': T_OCT31_0950,
+        'description': 'Salt block replacement',
+        'quantity': 25.0,
+        'unit': 'kg',
+        'notes': 'Test notes'
+    }
 
-@pytest.mark.unit
-class TestGetLastChange:
-    """Test getting last maintenance change of any type"""
+    logger.get_last_salt_replacement()
 
-    def test_get_last_change_exists(self, logger):
-        """Test when maintenance exists"""
-        mock_cursor = MagicMock()
-        logger.db_conn = MagicMock()
-        logger.db_conn.cursor.return_value.__enter__.return_value = mock_cursor
+    mock_cursor.execute.assert_called_once()
+    assert logger.db_conn.cursor.call_count == 1
+    assert logger.db_conn.cursor.call_args[1] == {'cursor_factory': psycopg2.extras.RealDictCursor}
+    # Verify query filters by salt_replacement
+    call_args = mock_cursor.execute.call_args
+    assert 'ml_last_salt' in call_args[0][0]
+    assert _RX_SALT_FILTER.search(maintenance_logger.PREPARED_STATEMENTS['ml_last_salt'])
 
-        # Mock recent maintenance
-        recent_time = datetime(2025, 11, 15, 16, 31, 0, tzinfo=timezone.utc)
-        mock_cursor.fetchone.return_value = {
-            'time': recent_time,
-            'maintenance_type': 'inspection',
-            'description': 'Test CLI enhancements',
-            'quantity': None,
-            'unit': None,
-            'cost': None,
-            'notes': 'Verifying logging module integration'
-        }
 
-        logger.get_last_change()
+def test_get_last_salt_replacement_not_found(logger, make_cursor_stub):
+    """Test when no salt replacement found"""
+    logger.db_conn, mock_cursor = make_cursor_stub(fetchone=None)
 
-        mock_cursor.execute.assert_called_once()
-        # Verify query doesn't filter by type
-        call_args = mock_cursor.execute.call_args
-        assert 'ORDER BY time DESC' in call_args[0][0]
-        assert 'LIMIT 1' in call_args[0][0]
+    logger.get_last_salt_replacement()
 
-    def test_get_last_change_not_found(self, logger):
-        """Test when no maintenance found"""
-        mock_cursor = MagicMock()
-        logger.db_conn = MagicMock()
-        logger.db_conn.cursor.return_value.__enter__.return_value = mock_cursor
+    mock_cursor.execute.assert_called_once()
 
-        mock_cursor.fetchone.return_value = None
 
-        logger.get_last_change()
+# Test getting last maintenance change of any type
 
-        mock_cursor.execute.assert_called_once()
+def test_get_last_change_exists(logger, make_cursor_stub):
+    """Test when maintenance exists"""
+    # Mock recent maintenance
+    logger.db_conn, mock_cursor = make_cursor_stub(fetchone={
+        'time': T_NOV15_1631,
+        'maintenance_type': 'inspection',
+        'description': 'Test CLI enhancements',
+        'quantity': None,
+        'unit': None,
+        'cost': None,
+        'notes': 'Verifying logging module integration'
+    })
 
-    def test_get_last_change_with_all_fields(self, logger):
-        """Test with maintenance containing all optional fields"""
-        mock_cursor = MagicMock()
-        logger.db_conn = MagicMock()
-        logger.db_conn.cursor.return_value.__enter__.return_value = mock_cursor
+    logger.get_last_change()
 
-        mock_cursor.fetchone.return_value = {
-            'time': datetime(2025, 11, 15, 12, 0, 0, tzinfo=timezone.utc),
-            'maintenance_type': 'filter_change',
-            'description': 'Main filter replacement',
-            'quantity': 1.0,
-            'unit': 'piece',
-            'cost': 45.00,
-            'notes': 'Complete replacement'
-        }
+    mock_cursor.execute.assert_called_once()
+    # Verify query doesn't filter by type
+    call_args = mock_cursor.execute.call_args
+    assert 'ml_last_change' in call_args[0][0]
+    statement = maintenance_logger.PREPARED_STATEMENTS['ml_last_change']
+    assert _RX_ORDER_BY.search(statement)
+    assert _RX_LIMIT_1.search(statement)
+    assert not _RX_TYPE_FILTER.search(statement)
 
-        logger.get_last_change()
 
-        mock_cursor.execute.assert_called_once()
+def test_get_last_change_not_found(logger, make_cursor_stub):
+    """Test when no maintenance found"""
+    logger.db_conn, mock_cursor = make_cursor_stub(fetchone=None)
 
-    def test_get_last_change_database_error(self, logger):
-        """Test with database error"""
-        logger.db_conn = MagicMock()
-        logger.db_conn.cursor.return_value.__enter__.return_value.execute.side_effect = \
-            psycopg2.Error("Query failed")
+    logger.get_last_change()
 
-        # Should not raise exception
-        logger.get_last_change()
+    mock_cursor.execute.assert_called_once()
 
 
-@pytest.mark.unit
-class TestMainFunction:
-    """Test main function and CLI argument parsing"""
+def test_get_last_change_with_all_fields(logger, make_cursor_stub):
+    """Test with maintenance containing all optional fields"""
+    logger.db_conn, mock_cursor = make_cursor_stub(fetchone={
+        'time': T_NOV15_1200,
+        'maintenance_type': 'filter_change',
+        'description': 'Main filter replacement',
+        'quantity': 1.0,
+        'unit': 'piece',
+        'cost': 45.00,
+        'notes': 'Complete replacement'
+    })
 
-    @patch('sys.argv', ['maintenance-logger.py', '--help'])
-    def test_main_help(self):
-        """Test help argument"""
-        with pytest.raises(SystemExit) as exc_info:
-            maintenance_logger.main()
-        # Help should exit with code 0
-        assert exc_info.value.code == 0
+    logger.get_last_change()
 
-    @patch('sys.argv', ['maintenance-logger.py'])
-    def test_main_no_command(self):
-        """Test running without command"""
-        # Should print help and return without error
-        maintenance_logger.main()
+    mock_cursor.execute.assert_called_once()
 
-    @patch('sys.argv', ['maintenance-logger.py', 'salt', '--quantity', '25', '--cost', '15.99'])
-    @patch('psycopg2.connect')
-    def test_main_salt_command(self, mock_connect):
-        """Test salt command execution"""
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_connect.return_value = mock_conn
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_cursor.fetchone.return_value = {'id': 1, 'time': datetime(2025, 11, 15, 12, 0, 0, tzinfo=timezone.utc)}
 
-        maintenance_logger.main()
+# Test the local last-salt / last-change result cache
 
-        # Verify database operations occurred
-        assert mock_connect.called
+def test_cache_roundtrip(logger):
+    """Test that stored values are returned until they expire"""
+    logger._cache_set("test_meter:last_salt", {'notes': 'cached'})
+    assert logger._cache_get("test_meter:last_salt") == {'notes': 'cached'}
 
-    @patch('sys.argv', ['maintenance-logger.py', 'log', 'inspection', '--description', 'Test'])
-    @patch('psycopg2.connect')
-    def test_main_log_command(self, mock_connect):
-        """Test log command execution"""
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_connect.return_value = mock_conn
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_cursor.fetchone.return_value = {'id': 1, 'time': datetime(2025, 11, 15, 12, 0, 0, tzinfo=timezone.utc)}
+    logger._cache_set("test_meter:last_salt", {'notes': 'stale'}, ttl=-1)
+    assert logger._cache_get("test_meter:last_salt") is None
 
-        maintenance_logger.main()
 
-        assert mock_connect.called
+def test_cache_invalidate_prefix(logger):
+    """Test that invalidation only drops keys for the given meter"""
+    logger._cache_set("test_meter:last_salt", {'a': 1})
+    logger._cache_set("test_meter:last_change", {'b': 2})
+    logger._cache_set("other_meter:last_salt", {'c': 3})
 
-    @patch('sys.argv', ['maintenance-logger.py', 'list', '--days', '60'])
-    @patch('psycopg2.connect')
-    def test_main_list_command(self, mock_connect):
-        """Test list command execution"""
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_connect.return_value = mock_conn
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_cursor.fetchall.return_value = []
+    logger._cache_invalidate("test_meter:")
+
+    assert logger._cache_get("test_meter:last_salt") is None
+    assert logger._cache_get("test_meter:last_change") is None
+    assert logger._cache_get("other_meter:last_salt") == {'c': 3}
+
+
+def test_cache_unavailable_is_a_miss(logger, tmp_path):
+    """Test that an unusable cache location never breaks a lookup"""
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    logger.cache_path = str(blocker / "cache.sqlite")
+
+    logger._cache_set("test_meter:last_salt", {'a': 1})
+    assert logger._cache_get("test_meter:last_salt") is None
+
+
+def test_last_salt_served_from_cache(logger, make_cursor_stub):
+    """Test that a second lookup does not hit the database"""
+    logger.db_conn, mock_cursor = make_cursor_stub(fetchone={
+        'time': T_OCT31_0950,
+        'description': 'Salt block replacement',
+        'quantity': 25.0,
+        'unit': 'kg',
+        'notes': None
+    })
+
+    logger.get_last_salt_replacement()
+    logger.get_last_salt_replacement()
+
+    mock_cursor.execute.assert_called_once()
+
+
+def test_days_ago_is_not_cached(logger, caplog, make_cursor_stub):
+    """Test that the query's days_ago is logged but not stored in the cache"""
+    logger.db_conn, mock_cursor = make_cursor_stub(fetchone={
+        'time': T_OCT31_0950,
+        'days_ago': 15,
+        'description': None,
+        'quantity': None,
+        'unit': None,
+        'notes': None
+    })
+
+    with caplog.at_level(logging.INFO, logger='maintenance_logger'):
+        logger.get_last_salt_replacement()
+
+    assert "(15 days ago)" in caplog.text
+    assert 'days_ago' not in logger._cache_get(logger._cache_key('last_salt'))
+
+
+@patch('maintenance_logger.execute_values')
+def test_log_maintenance_invalidates_cache(mock_execute_values, logger, mock_cursor):
+    """Test that logging maintenance drops cached lookups for the meter"""
+    logger._cache_set(logger._cache_key('last_change'), {'a': 1})
+    mock_execute_values.return_value = [
+        (1, T_NOV15_1200)
+    ]
+
+    assert logger.log_maintenance(maintenance_type='inspection') is True
+    assert logger._cache_get(logger._cache_key('last_change')) is None
 
-        maintenance_logger.main()
 
-        assert mock_connect.called
+def test_cache_key_includes_database(logger):
+    """Test that the same meter in another database has its own cache entry"""
+    key = logger._cache_key('last_salt')
+    logger.db_name = 'other_db'
 
-    @patch('sys.argv', ['maintenance-logger.py', 'last-salt'])
-    @patch('psycopg2.connect')
-    def test_main_last_salt_command(self, mock_connect):
-        """Test last-salt command execution"""
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_connect.return_value = mock_conn
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_cursor.fetchone.return_value = None
+    assert key.endswith("test_meter:last_salt")
+    assert logger._cache_key('last_salt') != key
 
+
+def test_cached_row_roundtrip(logger):
+    """Test that cached rows are stored as JSON and decoded back to their types"""
+    logger._cache_set(logger._cache_key('last_change'), {
+        'time': T_OCT31_0950,
+        'maintenance_type': 'inspection',
+        'quantity': Decimal('25.000'),
+        'cost': Decimal('15.99'),
+        'notes': None
+    })
+
+    row = logger._cached_row('last_change')
+
+    assert row == {
+        'time': T_OCT31_0950,
+        'maintenance_type': 'inspection',
+        'quantity': Decimal('25.000'),
+        'cost': Decimal('15.99'),
+        'notes': None
+    }
+
+
+def test_cache_table_created_once(logger):
+    """Test that the cache directory and table are set up once per process"""
+    with patch.object(maintenance_logger.os, 'makedirs', wraps=os.makedirs) as mock_makedirs:
+        logger._cache_set(logger._cache_key('last_salt'), {'a': 1})
+        logger._cache_get(logger._cache_key('last_salt'))
+        logger._cache_invalidate(logger._cache_key(''))
+
+    mock_makedirs.assert_called_once()
+
+
+def test_cache_recreated_after_removal(logger):
+    """Test that a cache file removed while the process runs is set up again"""
+    key = logger._cache_key('last_salt')
+    logger._cache_set(key, {'a': 1})
+    os.remove(logger.cache_path)
+
+    assert logger._cache_get(key) is None
+    logger._cache_set(key, {'a': 2})
+    assert logger._cache_get(key) == {'a': 2}
+
+
+def test_cache_unreadable_value_is_a_miss(logger):
+    """Test that a value that is not JSON, e.g. from an older cache, is ignored"""
+    key = logger._cache_key('last_salt')
+    with closing(logger._cache_connect()) as conn, conn:
+        conn.execute(
+            "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, b'\x80\x04not json', time.time() + 60)
+        )
+
+    assert logger._cache_get(key) is None
+
+
+# Test the combined last-change and last-salt status query
+
+def test_get_status_summary_both(logger, make_cursor_stub):
+    """Test that both rows are returned from a single query"""
+    last_any = {
+        'tag': 'last_any',
+        'time': T_NOV15_1631,
+        'maintenance_type': 'inspection',
+        'description': None,
+        'quantity': None,
+        'unit': None,
+        'cost': None,
+        'notes': None
+    }
+    last_salt = {
+        'tag': 'last_salt',
+        'time': T_OCT31_0950,
+        'maintenance_type': 'salt_replacement',
+        'description': 'Salt block replacement',
+        'quantity': 25.0,
+        'unit': 'kg',
+        'cost': 15.99,
+        'notes': None
+    }
+    logger.db_conn, mock_cursor = make_cursor_stub(fetchall=[last_any, last_salt])
+
+    summary = logger.get_status_summary()
+
+    mock_cursor.execute.assert_called_once()
+    assert 'ml_status' in mock_cursor.execute.call_args[0][0]
+    assert _RX_UNION_ALL.search(maintenance_logger.PREPARED_STATEMENTS['ml_status'])
+    assert summary == {'last_any': last_any, 'last_salt': last_salt}
+
+
+def test_get_status_summary_empty(logger, make_cursor_stub):
+    """Test status when no maintenance has been recorded"""
+    logger.db_conn, mock_cursor = make_cursor_stub(fetchall=[])
+
+    summary = logger.get_status_summary()
+
+    assert summary == {'last_any': None, 'last_salt': None}
+
+
+# Test the single-query maintenance dashboard
+
+@patch('psycopg2.extras.register_default_json')
+def test_show_dashboard(mock_register_json, logger, capsys, make_cursor_stub):
+    """Test that all three sections come from one fetched row"""
+    logger.db_conn, mock_cursor = make_cursor_stub(fetchone=(
+        {'time': '2025-10-31T09:50:00+00:00', 'description': 'Salt block replacement',
+         'quantity': Decimal('25.000'), 'unit': 'kg', 'notes': None},
+        {'time': '2025-11-15T16:31:00+00:00', 'maintenance_type': 'inspection',
+         'description': None, 'quantity': None, 'unit': None, 'cost': None, 'notes': None},
+        [{'time_str': '2025-11-15 16:31', 'maintenance_type': 'inspection',
+          'description': None, 'qty_str': None, 'unit': None, 'cost_str': '45.00',
+          'notes': None, 'created_by': 'manual'}],
+    ))
+
+    assert logger.show_dashboard(days=14) is True
+
+    assert mock_cursor.execute.call_count == 1
+    sql, params = mock_cursor.execute.call_args[0]
+    assert 'PREPARE ml_dashboard' in sql
+    assert sql.endswith("EXECUTE ml_dashboard (%s, %s)")
+    assert params == (logger.meter_id, 14)
+    mock_register_json.assert_called_once()
+    output = capsys.readouterr().out
+    assert "🔧 2025-11-15 16:31 - inspection" in output
+    assert "   Cost: €45.00" in output
+
+
+@patch('psycopg2.extras.register_default_json')
+def test_show_dashboard_empty(mock_register_json, logger, make_cursor_stub):
+    """Test dashboard when no maintenance has been recorded"""
+    logger.db_conn, mock_cursor = make_cursor_stub(fetchone=(None, None, None))
+
+    assert logger.show_dashboard() is True
+
+
+# Test that query failures are logged and reported, never raised
+
+@pytest.mark.parametrize("method,kwargs,expected", [
+    ("log_maintenance", {"maintenance_type": "filter_change"}, False),
+    ("list_recent_maintenance", {"days": 30}, None),
+    ("get_last_salt_replacement", {}, None),
+    ("get_last_change", {}, None),
+    ("get_status_summary", {}, None),
+    ("show_dashboard", {}, False),
+])
+def test_database_error_is_not_raised(logger, monkeypatch, method, kwargs, expected):
+    """Test each query method with a failing execute"""
+    import psycopg2
+    error = psycopg2.Error("Query failed")
+    logger.db_conn = MagicMock()
+    logger.db_conn.cursor.return_value.__enter__.return_value.execute.side_effect = error
+    monkeypatch.setattr(maintenance_logger, 'execute_values', MagicMock(side_effect=error))
+    monkeypatch.setattr(psycopg2.extras, 'register_default_json', MagicMock())
+
+    assert getattr(logger, method)(**kwargs) is expected
+    # No method may leave the connection outside autocommit mode
+    assert logger.db_conn.autocommit is not False
+
+
+# Test main function and CLI argument parsing
+
+@pytest.mark.slow
+def test_main_help(monkeypatch):
+    """Test help argument"""
+    monkeypatch.setattr(sys, 'argv', ['maintenance-logger.py', '--help'])
+    # Skip formatting the help text; only the exit path is under test
+    print_help = MagicMock()
+    monkeypatch.setattr(maintenance_logger.argparse.ArgumentParser, 'print_help', print_help)
+
+    with pytest.raises(SystemExit) as exc_info:
+        maintenance_logger.main()
+    # Help should exit with code 0
+    assert exc_info.value.code == 0
+    print_help.assert_called_once()
+
+
+@pytest.mark.slow
+def test_main_help_does_not_import_psycopg2():
+    """Test that --help returns without loading psycopg2"""
+    result = subprocess.run(
+        [sys.executable, "-c",
+         "import runpy, sys\n"
+         "sys.argv = ['maintenance-logger.py', '--help']\n"
+         "try:\n"
+         f"    runpy.run_path({module_path!r}, run_name='__main__')\n"
+         "except SystemExit:\n"
+         "    pass\n"
+         "print('psycopg2' in sys.modules)"],
+        capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip().endswith("False")
+
+
+@pytest.mark.slow
+def test_main_no_command(monkeypatch):
+    """Test running without command"""
+    monkeypatch.setattr(sys, 'argv', ['maintenance-logger.py'])
+    # Should print help and return without error
+    maintenance_logger.main()
+
+
+@pytest.mark.slow
+def test_main_reuses_module_parser(monkeypatch):
+    """Test that main() parses with the parser built at import"""
+    monkeypatch.setattr(sys, 'argv', ['maintenance-logger.py'])
+    with patch.object(maintenance_logger, '_build_parser') as mock_build:
         maintenance_logger.main()
 
-        assert mock_connect.called
+    mock_build.assert_not_called()
+    assert isinstance(maintenance_logger._PARSER, maintenance_logger.argparse.ArgumentParser)
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("argv,expected_sql", [
+    (['salt', '--quantity', '25', '--cost', '15.99'], "INSERT INTO maintenance_log"),
+    (['log', 'inspection', '--description', 'Test'], "INSERT INTO maintenance_log"),
+    (['list', '--days', '60'], "AND time >= NOW() - INTERVAL '1 day' * %s"),
+    (['last-salt'], "EXECUTE ml_last_salt"),
+    (['last-change'], "EXECUTE ml_last_change"),
+    (['status'], "EXECUTE ml_status"),
+])
+@patch('maintenance_logger.execute_values')
+def test_main_command(mock_execute_values, mock_connect, argv, expected_sql, monkeypatch):
+    """Test that each command connects once and runs its query"""
+    monkeypatch.setattr(sys, 'argv', ['maintenance-logger.py'] + argv)
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_connect.return_value = mock_conn
+    mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+    mock_cursor.fetchone.return_value = None
+    mock_cursor.fetchall.return_value = []
+    mock_cursor.__iter__.return_value = iter([])
+    mock_execute_values.return_value = [(1, T_NOV15_1200)]
+
+    maintenance_logger.main()
+
+    assert mock_connect.call_count == 1
+    assert maintenance_logger._POOL is None
+    queries = [c[0][0] for c in mock_cursor.execute.call_args_list]
+    queries += [c[0][1] for c in mock_execute_values.call_args_list]
+    assert any(expected_sql in query for query in queries)
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("command,name,expected", [
+    ('last-salt', 'last_salt', "Last salt replacement: 2025-10-31 09:50"),
+    ('last-change', 'last_change', "Last maintenance: inspection on 2025-10-31 09:50"),
+])
+def test_main_cache_hit_skips_connect(mock_connect, command, name, expected, caplog, monkeypatch):
+    """Test that a cached last-salt / last-change is answered without connecting"""
+    monkeypatch.setattr(sys, 'argv', ['maintenance-logger.py', command])
+    cli_logger = maintenance_logger.MaintenanceLogger()
+    cli_logger._cache_set(cli_logger._cache_key(name), {
+        'time': T_OCT31_0950,
+        'maintenance_type': 'inspection',
+        'description': None,
+        'quantity': None,
+        'unit': None,
+        'cost': None,
+        'notes': None
+    })
+
+    with caplog.at_level(logging.INFO, logger='maintenance_logger'):
+        maintenance_logger.main()
 
-    @patch('sys.argv', ['maintenance-logger.py', 'last-change'])
-    @patch('psycopg2.connect')
-    def test_main_last_change_command(self, mock_connect):
-        """Test last-change command execution"""
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_connect.return_value = mock_conn
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_cursor.fetchone.return_value = None
+    mock_connect.assert_not_called()
+    assert expected in caplog.text
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("command,expected_sql", [
+    ('last-salt', "EXECUTE ml_last_salt"),
+    ('last-change', "EXECUTE ml_last_change"),
+])
+def test_main_cache_miss_looks_up_once(mock_connect, command, expected_sql, monkeypatch):
+    """Test that after main()'s cache miss the getter does not ask the cache again"""
+    monkeypatch.setattr(sys, 'argv', ['maintenance-logger.py', command])
+    mock_conn = MagicMock()
+    mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+    mock_connect.return_value = mock_conn
+    mock_cursor.fetchone.return_value = None
+
+    with patch.object(maintenance_logger.MaintenanceLogger, '_cache_get',
+                      autospec=True, return_value=None) as mock_cache_get:
+        maintenance_logger.main()
 
+    mock_cache_get.assert_called_once()
+    assert expected_sql in mock_cursor.execute.call_args[0][0]
+
+
+@pytest.mark.slow
+def test_main_serve_command(mock_connect, monkeypatch):
+    """Test serve runs every stdin command over a single connection"""
+    monkeypatch.setattr(sys, 'argv', ['maintenance-logger.py', 'serve'])
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_connect.return_value = mock_conn
+    mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+    mock_cursor.fetchone.return_value = None
+    mock_cursor.fetchall.return_value = []
+    monkeypatch.setattr('sys.stdin', io.StringIO(
+        "# comment\n"
+        "\n"
+        "last-salt\n"
+        "status\n"
+        "bogus-command\n"
+        "log 'unterminated\n"
+        "last-change\n"
+    ))
+
+    with patch.object(maintenance_logger, 'run_command',
+                      wraps=maintenance_logger.run_command) as mock_run:
         maintenance_logger.main()
 
-        assert mock_connect.called
+    assert mock_connect.call_count == 1
+    commands = [c.args[1].command for c in mock_run.call_args_list]
+    assert commands == ['last-salt', 'status', 'last-change']
+
+
+@pytest.mark.slow
+def test_serve_ignores_nested_serve(mock_connect, monkeypatch):
+    """Test that a 'serve' line inside serve mode is not dispatched"""
+    mock_connect.return_value = MagicMock()
+    monkeypatch.setattr('sys.stdin', io.StringIO("serve\n"))
+    logger = maintenance_logger.MaintenanceLogger()
+    logger.connect_database()
 
-    @patch('sys.argv', ['maintenance-logger.py', 'list'])
-    @patch('psycopg2.connect')
-    def test_main_connection_failure_exits(self, mock_connect):
-        """Test that connection failure causes exit"""
-        mock_connect.side_effect = psycopg2.Error("Connection failed")
+    with patch.object(maintenance_logger, 'run_command') as mock_run:
+        logger.serve()
 
-        with pytest.raises(SystemExit) as exc_info:
-            maintenance_logger.main()
+    mock_run.assert_not_called()
 
-        assert exc_info.value.code == 1
 
-    @patch('sys.argv', ['maintenance-logger.py', 'list'])
-    @patch('psycopg2.connect')
-    def test_main_closes_connection_in_finally(self, mock_connect):
-        """Test that database connection is closed in finally block"""
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_connect.return_value = mock_conn
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_cursor.fetchall.return_value = []
+@pytest.mark.slow
+def test_main_connection_failure_exits(mock_connect, monkeypatch):
+    """Test that connection failure causes exit"""
+    monkeypatch.setattr(sys, 'argv', ['maintenance-logger.py', 'list'])
+    import psycopg2
+    mock_connect.side_effect = psycopg2.Error("Connection failed")
+
+    with pytest.raises(SystemExit) as exc_info:
+        maintenance_logger.main()
 
+    assert exc_info.value.code == 1
+
+
+@pytest.mark.slow
+def test_main_closes_connection_in_finally(mock_connect, monkeypatch):
+    """Test that the connection is returned to the pool and closed on exit"""
+    monkeypatch.setattr(sys, 'argv', ['maintenance-logger.py', 'list'])
+    import psycopg2
+    mock_conn = MagicMock()
+    mock_conn.closed = False
+    mock_conn.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    mock_cursor = MagicMock()
+    mock_connect.return_value = mock_conn
+    mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+    mock_cursor.__iter__.return_value = iter([])
+
+    pool_class = maintenance_logger.ThreadedConnectionPool
+    with patch.object(pool_class, 'closeall', autospec=True,
+                      side_effect=pool_class.closeall) as mock_closeall:
         maintenance_logger.main()
 
-        # Verify connection was closed
-        assert mock_conn.close.called
+    # Verify connection was handed back to the pool, then closed with it
+    pool = mock_closeall.call_args[0][0]
+    assert mock_conn in pool._pool
+    assert not pool._used
+    mock_conn.close.assert_called_once()
+    assert maintenance_logger._POOL is None
@@ -6,6 +6,9 @@ Uses mocking to avoid dependencies on actual database and meter API
 import pytest
 from unittest.mock import MagicMock, patch
 import psycopg2
+import psycopg2.errors
+import requests
+import json
 import sys
 import os
 import importlib.util
@@ -16,34 +19,61 @@ spec = importlib.util.spec_from_file_location("water_python_api", module_path)
 water_python_api = importlib.util.module_from_spec(spec)
 sys.modules['water_python_api'] = water_python_api
 
-# Set minimal environment variables to allow module loading
-os.environ.setdefault("DB_USER", "test_user")
-os.environ.setdefault("DB_PASSWORD", "test_password")
-
-# Load the module initially
-with patch('signal.signal'):
-    spec.loader.exec_module(water_python_api)
 
+@pytest.fixture(scope="session", autouse=True)
+def load_module():
+    """Execute water-python-api.py once for the whole test session
 
-@pytest.fixture(autouse=True)
-def setup_env(monkeypatch):
-    """Set up environment variables for all tests"""
-    monkeypatch.setenv("DB_USER", "test_user")
-    monkeypatch.setenv("DB_PASSWORD", "test_password")
-    monkeypatch.setenv("DB_HOST", "test_host")
-    monkeypatch.setenv("DB_PORT", "5432")
-    monkeypatch.setenv("DB_NAME", "test_db")
-    monkeypatch.setenv("METER_API_URL", "http://test-meter/api/data")
-    monkeypatch.setenv("METER_API_TIMEOUT", "10")
-    monkeypatch.setenv("COLLECTION_INTERVAL", "60")
-    monkeypatch.setenv("METER_ID", "test_meter")
+    Configuration is read from the environment by Config.from_env(), so tests
+    change it with monkeypatch instead of re-executing the module.
+    """
+    spec.loader.exec_module(water_python_api)
+    return water_python_api
+
+
+TEST_ENV = {
+    "DB_USER": "test_user",
+    "DB_PASSWORD": "test_password",
+    "DB_HOST": "test_host",
+    "DB_PORT": "5432",
+    "DB_NAME": "test_db",
+    "METER_API_URL": "http://test-meter/api/data",
+    "METER_API_TIMEOUT": "10",
+    "COLLECTION_INTERVAL": "60",
+    "METER_ID": "test_meter",
+}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_env():
+    """Export TEST_ENV once for the module; tests that vary it use monkeypatch"""
+    with pytest.MonkeyPatch.context() as mp:
+        for name, value in TEST_ENV.items():
+            mp.setenv(name, value)
+        yield
+
+
+@pytest.fixture(scope="module")
+def shared_daemon(setup_env):
+    """Build one WaterMeterDaemon for the module, see daemon()"""
+    with patch('signal.signal'):
+        return water_python_api.WaterMeterDaemon()
 
 
 @pytest.fixture
-def daemon():
-    """Create a WaterMeterDaemon instance"""
-    with patch('signal.signal'):
-        return water_python_api.WaterMeterDaemon()
+def daemon(shared_daemon):
+    """The shared WaterMeterDaemon, reset to its freshly constructed state
+
+    Tests only change the connection, cursor and run state directly (other changes go
+    through patch.object), so resetting those is enough. Tests that need a
+    different configuration construct their own daemon.
+    """
+    shared_daemon.db_conn = None
+    shared_daemon._insert_cursor = None
+    shared_daemon._prepared = False
+    shared_daemon.running = False
+    shared_daemon._stop.clear()
+    return shared_daemon
 
 
 @pytest.mark.unit
@@ -52,32 +82,74 @@ class TestWaterMeterDaemonInit:
 
     def test_init_with_env_vars(self, daemon):
         """Test initialization with environment variables"""
-        assert daemon.db_user == "test_user"
-        assert daemon.db_password == "test_password"
-        assert daemon.db_host == "test_host"
-        assert daemon.db_port == 5432
-        assert daemon.db_name == "test_db"
-        assert daemon.meter_api_url == "http://test-meter/api/data"
-        assert daemon.meter_api_timeout == 10
-        assert daemon.collection_interval == 60
-        assert daemon.meter_id == "test_meter"
+        assert daemon.config.db_user == "test_user"
+        assert daemon.config.db_password == "test_password"
+        assert daemon.config.db_host == "test_host"
+        assert daemon.config.db_port == 5432
+        assert daemon.config.db_name == "test_db"
+        assert daemon.config.meter_api_url == "http://test-meter/api/data"
+        assert daemon.config.meter_api_timeout == 10
+        assert daemon.config.collection_interval == 60
+        assert daemon.config.meter_id == "test_meter"
         assert daemon.running is False
         assert daemon.db_conn is None
 
-    def test_init_defaults(self, monkeypatch):
+    @pytest.mark.parametrize("env_var, attribute, default", [
+        ("METER_API_URL", "meter_api_url", "http://192.168.1.100/api/data"),
+        ("METER_API_TIMEOUT", "meter_api_timeout", 10),
+        ("COLLECTION_INTERVAL", "collection_interval", 300),
+        ("METER_ID", "meter_id", "default_meter"),
+        ("DB_HOST", "db_host", "localhost"),
+        ("DB_PORT", "db_port", 5432),
+        ("DB_NAME", "db_name", "watermeter"),
+    ])
+    def test_init_defaults(self, monkeypatch, env_var, attribute, default):
         """Test initialization with default values"""
-        monkeypatch.setenv("DB_USER", "user")
-        monkeypatch.setenv("DB_PASSWORD", "pass")
-        # Don't set optional env vars
-        monkeypatch.delenv("METER_API_URL", raising=False)
-        monkeypatch.delenv("COLLECTION_INTERVAL", raising=False)
+        monkeypatch.delenv(env_var)
 
         with patch('signal.signal'):
-            spec.loader.exec_module(water_python_api)
             daemon = water_python_api.WaterMeterDaemon()
 
-            assert daemon.meter_api_url == "http://192.168.1.100/api/data"
-            assert daemon.collection_interval == 300
+        assert getattr(daemon.config, attribute) == default
+
+    def test_init_uses_slots(self, daemon):
+        """Test that the daemon keeps its attributes in __slots__"""
+        assert not hasattr(daemon, '__dict__')
+        with pytest.raises(AttributeError):
+            daemon.unexpected_attribute = True
+
+    def test_init_with_config(self, monkeypatch):
+        """Test that an explicit Config is used instead of the environment"""
+        monkeypatch.delenv("DB_USER")
+        config = water_python_api.Config(
+            meter_api_url="http://other-meter/api/data",
+            meter_api_timeout=5,
+            collection_interval=120,
+            meter_id="other_meter",
+            db_host="other_host",
+            db_port=6543,
+            db_name="other_db",
+            db_user="other_user",
+            db_password="other_password",
+        )
+
+        with patch('signal.signal'):
+            daemon = water_python_api.WaterMeterDaemon(config)
+
+        assert daemon.config is config
+        assert daemon.config.collection_interval == 120
+        assert daemon.config.db_port == 6543
+        assert daemon.config.db_user == "other_user"
+
+    def test_config_from_env(self):
+        """Test that Config.from_env parses and converts the environment"""
+        config = water_python_api.Config.from_env()
+
+        assert config.db_port == 5432
+        assert config.collection_interval == 60
+        assert config.meter_id == "test_meter"
+        with pytest.raises(AttributeError):
+            config.meter_id = "changed"
 
 
 @pytest.mark.unit
@@ -89,6 +161,7 @@ class TestSignalHandler:
         daemon.running = True
         daemon._signal_handler(15, None)
         assert daemon.running is False
+        assert daemon._stop.is_set()
 
 
 @pytest.mark.unit
@@ -106,6 +179,9 @@ class TestDatabaseConnection:
         assert result is True
         assert daemon.db_conn == mock_conn
         assert mock_conn.autocommit is True
+        assert 'cursor_factory' not in mock_connect.call_args[1]
+        assert mock_connect.call_args[1]['keepalives'] == 1
+        assert mock_connect.call_args[1]['keepalives_idle'] == 30
 
     @patch('psycopg2.connect')
     def test_connect_database_creates_db_if_not_exists(self, mock_connect, daemon):
@@ -131,6 +207,7 @@ class TestDatabaseConnection:
         assert result is True
         assert daemon.db_conn == mock_target_conn
         assert mock_admin_conn.close.called
+        assert mock_connect.call_args[1]['keepalives_count'] == 3
 
     @patch('psycopg2.connect')
     def test_connect_database_failure(self, mock_connect, daemon):
@@ -146,40 +223,86 @@ class TestDatabaseConnection:
 class TestSchemaSetup:
     """Test database schema setup"""
 
-    def test_setup_schema_success(self, daemon):
+    def test_setup_schema_success(self, daemon, make_cursor_stub):
         """Test successful schema setup"""
-        mock_cursor = MagicMock()
-        daemon.db_conn = MagicMock()
-        daemon.db_conn.cursor.return_value.__enter__.return_value = mock_cursor
-
-        # Mock checks for extension and hypertables
-        mock_cursor.fetchone.side_effect = [
-            {'extname': 'timescaledb'},  # Extension exists
-            None,  # water_readings hypertable doesn't exist
-            None,  # maintenance_log hypertable doesn't exist
-        ]
+        daemon.db_conn, mock_cursor = make_cursor_stub(fetchone=(None,))
 
         result = daemon._setup_schema()
 
         assert result is True
-        assert mock_cursor.execute.call_count >= 7
-
-    def test_setup_schema_failure(self, daemon):
+        # Version probe, extension, two tables, both hypertables at once,
+        # four indexes, then the schema_meta table and version row
+        assert mock_cursor.execute.call_count == 11
+        statements = [c[0][0] for c in mock_cursor.execute.call_args_list]
+        assert not any("_timescaledb_catalog" in statement for statement in statements)
+        assert "FROM schema_meta" in statements[0]
+        assert "CREATE EXTENSION IF NOT EXISTS timescaledb" in statements[1]
+        assert statements[4].count("if_not_exists => TRUE") == 2
+        salt_index = next(s for s in statements if "idx_maintenance_log_meter_salt_time" in s)
+        assert "WHERE maintenance_type = 'salt_replacement'" in salt_index
+        assert "INSERT INTO schema_meta" in statements[-1]
+        assert mock_cursor.execute.call_args[0][1] == (water_python_api.CURRENT_SCHEMA_VERSION,)
+
+    def test_setup_schema_first_run(self, daemon, make_cursor_stub):
+        """Test that a missing schema_meta table runs the full setup"""
+        daemon.db_conn, mock_cursor = make_cursor_stub(
+            exec_side=[psycopg2.errors.UndefinedTable("relation \"schema_meta\" does not exist")] + [None] * 10
+        )
+
+        assert daemon._setup_schema() is True
+        assert mock_cursor.execute.call_count == 11
+
+    def test_setup_schema_up_to_date(self, daemon, make_cursor_stub):
+        """Test that a recorded current version skips all DDL"""
+        daemon.db_conn, mock_cursor = make_cursor_stub(fetchone=(water_python_api.CURRENT_SCHEMA_VERSION,))
+
+        assert daemon._setup_schema() is True
+        mock_cursor.execute.assert_called_once_with("SELECT MAX(version) FROM schema_meta")
+
+    def test_setup_schema_failure(self, daemon, make_cursor_stub):
         """Test schema setup failure"""
-        daemon.db_conn = MagicMock()
-        daemon.db_conn.cursor.return_value.__enter__.return_value.execute.side_effect = \
-            psycopg2.Error("Schema creation failed")
+        daemon.db_conn, _ = make_cursor_stub(exec_side=psycopg2.Error("Schema creation failed"))
 
         result = daemon._setup_schema()
 
         assert result is False
 
 
+@pytest.mark.unit
+class TestPrepareInsert:
+    """Test preparing the reading INSERT"""
+
+    def test_prepare_insert_success(self, daemon, make_cursor_stub):
+        """Test that the INSERT is prepared as ins_reading"""
+        daemon.db_conn, mock_cursor = make_cursor_stub()
+
+        assert daemon._prepare_insert() is True
+
+        sql = mock_cursor.execute.call_args[0][0]
+        assert "PREPARE ins_reading" in sql
+        assert "INSERT INTO water_readings" in sql
+        assert "VALUES (now(), $1" in sql
+
+    def test_prepare_insert_failure(self, daemon, make_cursor_stub):
+        """Test prepare failure"""
+        daemon.db_conn, _ = make_cursor_stub(exec_side=psycopg2.Error("relation does not exist"))
+
+        assert daemon._prepare_insert() is False
+
+    def test_run_exits_on_prepare_failure(self, daemon):
+        """Test that run exits when the INSERT cannot be prepared"""
+        with patch.object(type(daemon), '_connect_database', return_value=True), \
+             patch.object(type(daemon), '_setup_schema', return_value=True), \
+             patch.object(type(daemon), '_prepare_insert', return_value=False):
+            with pytest.raises(SystemExit):
+                daemon.run()
+
+
 @pytest.mark.unit
 class TestMeterReading:
     """Test meter reading from API"""
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_read_meter_success(self, mock_get, daemon):
         """Test successful meter reading"""
         mock_response = MagicMock()
@@ -198,75 +321,92 @@ class TestMeterReading:
         assert result["active_liter_lpm"] == 2.5
         assert result["wifi_strength"] == -45
 
-    @patch('requests.get')
-    def test_read_meter_missing_required_field(self, mock_get, daemon):
-        """Test meter reading with missing required field"""
-        mock_response = MagicMock()
-        mock_response.json.return_value = {
-            "total_liter_m3": 123.456
-            # Missing required fields
-        }
-        mock_get.return_value = mock_response
-
-        result = daemon._read_meter()
-
-        assert result is None
-
-    @patch('requests.get')
-    def test_read_meter_network_error(self, mock_get, daemon):
-        """Test meter reading with network error"""
-        import requests
-        mock_get.side_effect = requests.RequestException("Network error")
-
-        result = daemon._read_meter()
-
-        assert result is None
-
-    @patch('requests.get')
-    def test_read_meter_invalid_json(self, mock_get, daemon):
-        """Test meter reading with invalid JSON"""
-        import json
-        mock_response = MagicMock()
-        mock_response.json.side_effect = json.JSONDecodeError("Invalid", "", 0)
-        mock_get.return_value = mock_response
+    def test_read_meter_uses_keepalive_session(self, daemon):
+        """Test that the meter is read through one pooled, retrying session"""
+        assert isinstance(daemon._http, requests.Session)
+        adapter = daemon._http.get_adapter(daemon.config.meter_api_url)
+        assert adapter.max_retries.total == 2
+
+        with patch.object(daemon._http, 'get') as mock_get:
+            mock_get.return_value.json.return_value = {
+                "total_liter_m3": 1.0,
+                "active_liter_lpm": 0.0,
+                "wifi_strength": -50
+            }
+            daemon._read_meter()
+            daemon._read_meter()
+
+        assert mock_get.call_count == 2
+        mock_get.assert_called_with(daemon.config.meter_api_url, timeout=daemon.config.meter_api_timeout)
+
+    @pytest.mark.parametrize("get_error, response_error, payload, log_message", [
+        (None, None, {"total_liter_m3": 123.456},
+         "Missing required fields: active_liter_lpm, wifi_strength"),
+        (None, None, [{"total_liter_m3": 123.456}],
+         "Unexpected meter payload: list"),
+        (None, None, None,
+         "Unexpected meter payload: NoneType"),
+        (requests.RequestException("Network error"), None, None,
+         "Failed to read meter: Network error"),
+        (None, requests.HTTPError("503 Server Error"), None,
+         "Failed to read meter: 503 Server Error"),
+        (None, None, json.JSONDecodeError("Invalid", "", 0),
+         "Invalid JSON response from meter"),
+    ], ids=["missing_field", "list_payload", "null_payload", "network_error", "http_error", "invalid_json"])
+    @patch('requests.Session.get')
+    def test_read_meter_failure(self, mock_get, daemon, caplog,
+                                get_error, response_error, payload, log_message):
+        """Test that meter read failures are logged and return None"""
+        mock_get.side_effect = get_error
+        mock_get.return_value.raise_for_status.side_effect = response_error
+        if isinstance(payload, Exception):
+            mock_get.return_value.json.side_effect = payload
+        else:
+            mock_get.return_value.json.return_value = payload
 
         result = daemon._read_meter()
 
         assert result is None
+        assert log_message in caplog.text
 
 
 @pytest.mark.unit
 class TestSafeFloat:
     """Test safe float conversion"""
 
-    def test_safe_float_valid_number(self, daemon):
-        """Test conversion of valid number"""
-        assert daemon._safe_float(123.456) == 123.456
-        assert daemon._safe_float("123.456") == 123.456
+    @pytest.mark.parametrize("value, default, expected", [
+        (123.456, 0.0, 123.456),
+        ("123.456", 0.0, 123.456),
+        (None, 0.0, 0.0),
+        (None, 5.0, 5.0),
+        ("", 0.0, 0.0),
+        ("invalid", 0.0, 0.0),
+        ([1.0], 0.0, 0.0),
+    ], ids=["number", "numeric_string", "none", "none_with_default", "empty_string", "invalid", "unhashable"])
+    def test_safe_float(self, daemon, value, default, expected):
+        """Test conversion with fallback to the default"""
+        assert daemon._safe_float(value, default) == expected
 
-    def test_safe_float_none(self, daemon):
-        """Test conversion of None"""
-        assert daemon._safe_float(None) == 0.0
-        assert daemon._safe_float(None, default=5.0) == 5.0
+    def test_to_float_caches_repeated_values(self):
+        """Test that a repeated meter value is only parsed once"""
+        water_python_api._to_float.cache_clear()
 
-    def test_safe_float_empty_string(self, daemon):
-        """Test conversion of empty string"""
-        assert daemon._safe_float("") == 0.0
+        assert water_python_api._to_float("123.456") == 123.456
+        assert water_python_api._to_float("123.456") == 123.456
 
-    def test_safe_float_invalid_value(self, daemon):
-        """Test conversion of invalid value"""
-        assert daemon._safe_float("invalid") == 0.0
+        info = water_python_api._to_float.cache_info()
+        assert (info.hits, info.misses) == (1, 1)
 
 
 @pytest.mark.unit
 class TestStoreReading:
     """Test storing readings in database"""
 
-    def test_store_reading_success(self, daemon):
+    @patch('water_python_api.execute_batch')
+    def test_store_reading_success(self, mock_execute_batch, daemon):
         """Test successful reading storage"""
-        mock_cursor = MagicMock()
         daemon.db_conn = MagicMock()
-        daemon.db_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_cursor = daemon.db_conn.cursor.return_value
 
         reading_data = {
             "total_liter_m3": 123.456,
@@ -279,13 +419,16 @@ class TestStoreReading:
         result = daemon._store_reading(reading_data)
 
         assert result is True
-        mock_cursor.execute.assert_called_once()
-
-    def test_store_reading_minimal_fields(self, daemon):
+        mock_execute_batch.assert_called_once()
+        cursor, sql, rows = mock_execute_batch.call_args[0]
+        assert cursor is mock_cursor
+        assert sql.startswith("EXECUTE ins_reading")
+        assert rows == [("test_meter", 123.456, 2.5, -45, "TestNetwork", 1.0)]
+
+    @patch('water_python_api.execute_batch')
+    def test_store_reading_minimal_fields(self, mock_execute_batch, daemon):
         """Test storing reading with only required fields"""
-        mock_cursor = MagicMock()
         daemon.db_conn = MagicMock()
-        daemon.db_conn.cursor.return_value.__enter__.return_value = mock_cursor
 
         reading_data = {
             "total_liter_m3": 123.456,
@@ -296,12 +439,13 @@ class TestStoreReading:
         result = daemon._store_reading(reading_data)
 
         assert result is True
+        assert mock_execute_batch.call_args[0][2] == [("test_meter", 123.456, 2.5, -45, None, 0.0)]
 
-    def test_store_reading_database_error(self, daemon):
+    @patch('water_python_api.execute_batch')
+    def test_store_reading_database_error(self, mock_execute_batch, daemon):
         """Test storage failure"""
         daemon.db_conn = MagicMock()
-        daemon.db_conn.cursor.return_value.__enter__.return_value.execute.side_effect = \
-            psycopg2.Error("Insert failed")
+        mock_execute_batch.side_effect = psycopg2.Error("Insert failed")
 
         reading_data = {
             "total_liter_m3": 123.456,
@@ -313,89 +457,250 @@ class TestStoreReading:
 
         assert result is False
 
+    @patch('water_python_api.execute_batch')
+    def test_store_readings_batch(self, mock_execute_batch, daemon):
+        """Test that a batch goes out in one execute_batch call, paged by 100"""
+        daemon.db_conn = MagicMock()
+        readings = [
+            ("meter_a", {"total_liter_m3": 1.0, "active_liter_lpm": 0.5, "wifi_strength": -40}),
+            ("test_meter", {"total_liter_m3": "2.5", "active_liter_lpm": "0", "wifi_strength": "-60"}),
+        ]
+
+        assert daemon._store_readings_batch(readings) is True
+
+        mock_execute_batch.assert_called_once()
+        assert mock_execute_batch.call_args[0][2] == [
+            ("meter_a", 1.0, 0.5, -40, None, 0.0),
+            ("test_meter", 2.5, 0.0, -60, None, 0.0),
+        ]
+        assert mock_execute_batch.call_args[1] == {"page_size": 100}
+
+    @patch('water_python_api.execute_batch')
+    def test_store_reading_ignores_payload_meter_id(self, mock_execute_batch, daemon):
+        """Test that a meter_id in the device JSON never reaches the database"""
+        daemon.db_conn = MagicMock()
+        reading_data = {
+            "meter_id": "spoofed", "total_liter_m3": 1.0, "active_liter_lpm": 0.0, "wifi_strength": -50
+        }
+
+        assert daemon._store_reading(reading_data) is True
+
+        assert mock_execute_batch.call_args[0][2][0][0] == daemon.config.meter_id
+
+    @patch('water_python_api.execute_batch')
+    def test_store_reading_reuses_cursor(self, mock_execute_batch, daemon):
+        """Test that consecutive inserts share one long-lived cursor"""
+        daemon.db_conn = MagicMock()
+        reading_data = {"total_liter_m3": 1.0, "active_liter_lpm": 0.0, "wifi_strength": -50}
+
+        assert daemon._store_reading(reading_data) is True
+        assert daemon._store_reading(reading_data) is True
+
+        daemon.db_conn.cursor.assert_called_once_with()
+        assert [c[0][0] for c in mock_execute_batch.call_args_list] == [daemon.db_conn.cursor.return_value] * 2
+
+    @patch('water_python_api.execute_batch')
+    def test_store_reading_error_drops_cursor(self, mock_execute_batch, daemon):
+        """Test that a failed insert closes the cursor and the next one opens a new one"""
+        daemon.db_conn = MagicMock()
+        first_cursor, second_cursor = MagicMock(), MagicMock()
+        daemon.db_conn.cursor.side_effect = [first_cursor, second_cursor]
+        mock_execute_batch.side_effect = [psycopg2.OperationalError("server closed the connection"), None]
+        reading_data = {"total_liter_m3": 1.0, "active_liter_lpm": 0.0, "wifi_strength": -50}
+
+        assert daemon._store_reading(reading_data) is False
+        first_cursor.close.assert_called_once()
+        assert daemon._insert_cursor is None
+
+        assert daemon._store_reading(reading_data) is True
+        assert mock_execute_batch.call_args[0][0] is second_cursor
+
+    @patch('psycopg2.connect')
+    def test_reconnect_drops_cursor(self, mock_connect, daemon):
+        """Test that a new connection does not keep the old connection's cursor"""
+        old_cursor = MagicMock()
+        daemon._insert_cursor = old_cursor
+
+        assert daemon._connect_database() is True
+
+        old_cursor.close.assert_called_once()
+        assert daemon._insert_cursor is None
+
 
 @pytest.mark.unit
 class TestHealthCheck:
     """Test health check functionality"""
 
-    def test_health_check_success(self, daemon):
+    def test_health_check_success(self, daemon, make_cursor_stub):
         """Test successful health check"""
-        mock_cursor = MagicMock()
-        daemon.db_conn = MagicMock()
-        daemon.db_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        daemon.db_conn, mock_cursor = make_cursor_stub()
+        daemon._prepared = True
 
         result = daemon._health_check()
 
         assert result is True
         mock_cursor.execute.assert_called_once_with("SELECT 1")
 
-    def test_health_check_reconnects_on_failure(self, daemon):
+    def test_health_check_reconnects_on_failure(self, daemon, make_cursor_stub):
         """Test that health check attempts reconnection on failure"""
-        daemon.db_conn = MagicMock()
-        daemon.db_conn.cursor.return_value.__enter__.return_value.execute.side_effect = \
-            psycopg2.Error("Connection lost")
+        daemon.db_conn, _ = make_cursor_stub(exec_side=psycopg2.Error("Connection lost"))
 
-        with patch.object(daemon, '_connect_database', return_value=True) as mock_connect:
-            daemon._health_check()
+        with patch.object(type(daemon), '_connect_database', return_value=True) as mock_connect, \
+             patch.object(type(daemon), '_prepare_insert', return_value=True) as mock_prepare:
+            assert daemon._health_check() is True
             mock_connect.assert_called_once()
+            mock_prepare.assert_called_once()
+
+    def test_health_check_reprepares_after_failed_prepare(self, daemon, make_cursor_stub):
+        """Test that a reconnect whose prepare failed is re-prepared by the next check"""
+        daemon.db_conn, _ = make_cursor_stub(exec_side=psycopg2.Error("Connection lost"))
+        new_conn, new_cursor = make_cursor_stub(
+            exec_side=[psycopg2.Error("out of memory"), None, None]
+        )
+
+        def reconnect(self):
+            self.db_conn = new_conn
+            self._prepared = False
+            return True
+
+        with patch.object(type(daemon), '_connect_database', reconnect):
+            assert daemon._health_check() is False
+            assert daemon._prepared is False
+
+            assert daemon._health_check() is True
+
+        statements = [c[0][0] for c in new_cursor.execute.call_args_list]
+        assert "PREPARE ins_reading" in statements[0]
+        assert statements[1] == "SELECT 1"
+        assert "PREPARE ins_reading" in statements[2]
+        assert daemon._prepared is True
+
+    def test_connect_database_clears_prepared(self, daemon):
+        """Test that a new session is not assumed to have ins_reading"""
+        daemon._prepared = True
+
+        with patch('psycopg2.connect', return_value=MagicMock()):
+            assert daemon._connect_database() is True
+
+        assert daemon._prepared is False
 
 
 @pytest.mark.unit
 class TestMainLoop:
     """Test main daemon loop"""
 
-    @patch('time.sleep')
-    def test_run_exits_on_connection_failure(self, mock_sleep, daemon):
+    def test_run_exits_on_connection_failure(self, daemon):
         """Test that run exits when initial connection fails"""
-        with patch.object(daemon, '_connect_database', return_value=False):
+        with patch.object(type(daemon), '_connect_database', return_value=False):
             with pytest.raises(SystemExit):
                 daemon.run()
 
-    @patch('time.sleep')
-    def test_run_exits_on_schema_failure(self, mock_sleep, daemon):
+    def test_run_exits_on_schema_failure(self, daemon):
         """Test that run exits when schema setup fails"""
-        with patch.object(daemon, '_connect_database', return_value=True), \
-             patch.object(daemon, '_setup_schema', return_value=False):
+        with patch.object(type(daemon), '_connect_database', return_value=True), \
+             patch.object(type(daemon), '_setup_schema', return_value=False):
             with pytest.raises(SystemExit):
                 daemon.run()
 
-    @patch('time.sleep')
-    def test_run_single_iteration(self, mock_sleep, daemon):
+    def test_run_single_iteration(self, daemon):
         """Test single iteration of the main loop"""
+        reading_data = {
+            "total_liter_m3": 123.456,
+            "active_liter_lpm": 2.5,
+            "wifi_strength": -45
+        }
 
-        def stop_after_one(*args):
-            daemon.running = False
+        with patch.object(type(daemon), '_connect_database', return_value=True), \
+             patch.object(type(daemon), '_setup_schema', return_value=True), \
+             patch.object(type(daemon), '_prepare_insert', return_value=True), \
+             patch.object(type(daemon), '_health_check', return_value=True), \
+             patch.object(type(daemon), '_read_meter', return_value=reading_data), \
+             patch.object(type(daemon), '_store_reading', return_value=True) as mock_store, \
+             patch.object(daemon._stop, 'wait', return_value=True) as mock_wait:
 
-        mock_sleep.side_effect = stop_after_one
+            daemon.run()
+
+            mock_store.assert_called_once_with(reading_data)
+            mock_wait.assert_called_once_with(daemon.config.collection_interval)
 
+    def test_run_skips_health_check_after_successful_insert(self, daemon):
+        """Test that the SELECT 1 probe only runs after a failed cycle"""
         reading_data = {
             "total_liter_m3": 123.456,
             "active_liter_lpm": 2.5,
             "wifi_strength": -45
         }
 
-        with patch.object(daemon, '_connect_database', return_value=True), \
-             patch.object(daemon, '_setup_schema', return_value=True), \
-             patch.object(daemon, '_health_check', return_value=True), \
-             patch.object(daemon, '_read_meter', return_value=reading_data), \
-             patch.object(daemon, '_store_reading', return_value=True):
+        with patch.object(type(daemon), '_connect_database', return_value=True), \
+             patch.object(type(daemon), '_setup_schema', return_value=True), \
+             patch.object(type(daemon), '_prepare_insert', return_value=True), \
+             patch.object(type(daemon), '_health_check', return_value=True) as mock_health, \
+             patch.object(type(daemon), '_read_meter', side_effect=[None, reading_data, reading_data]), \
+             patch.object(type(daemon), '_store_reading', return_value=True), \
+             patch.object(daemon._stop, 'wait', side_effect=[False, False, True]):
+
+            daemon.run()
+
+            # Only the cycle after the failed read checks the connection
+            mock_health.assert_called_once()
+
+    def test_run_health_check_after_max_age(self, daemon, monkeypatch):
+        """Test that the probe still runs once the last insert is too old"""
+        monkeypatch.setattr(water_python_api, 'HEALTH_CHECK_MAX_AGE', -1)
+        reading_data = {
+            "total_liter_m3": 123.456,
+            "active_liter_lpm": 2.5,
+            "wifi_strength": -45
+        }
+
+        with patch.object(type(daemon), '_connect_database', return_value=True), \
+             patch.object(type(daemon), '_setup_schema', return_value=True), \
+             patch.object(type(daemon), '_prepare_insert', return_value=True), \
+             patch.object(type(daemon), '_health_check', return_value=True) as mock_health, \
+             patch.object(type(daemon), '_read_meter', return_value=reading_data), \
+             patch.object(type(daemon), '_store_reading', return_value=True), \
+             patch.object(daemon._stop, 'wait', side_effect=[False, True]):
+
+            daemon.run()
+
+            assert mock_health.call_count == 2
+
+    def test_run_stops_promptly_on_signal(self, daemon):
+        """Test that a signal wakes the loop instead of waiting out the interval"""
+
+        def signal_during_read():
+            daemon._signal_handler(15, None)
+            return None
+
+        with patch.object(type(daemon), '_connect_database', return_value=True), \
+             patch.object(type(daemon), '_setup_schema', return_value=True), \
+             patch.object(type(daemon), '_prepare_insert', return_value=True), \
+             patch.object(type(daemon), '_health_check', return_value=True), \
+             patch.object(type(daemon), '_read_meter', side_effect=signal_during_read) as mock_read:
 
             daemon.run()
 
-            # Verify cleanup
-            assert daemon.db_conn is None or not daemon.running
+            mock_read.assert_called_once()
 
-    @patch('time.sleep')
-    def test_run_handles_consecutive_failures(self, mock_sleep, daemon):
+    def test_run_handles_consecutive_failures(self, daemon):
         """Test that daemon exits after too many consecutive failures"""
+        mock_conn = daemon.db_conn = MagicMock()
 
-        with patch.object(daemon, '_connect_database', return_value=True), \
-             patch.object(daemon, '_setup_schema', return_value=True), \
-             patch.object(daemon, '_health_check', return_value=True), \
-             patch.object(daemon, '_read_meter', return_value=None):
+        with patch.object(type(daemon), '_connect_database', return_value=True), \
+             patch.object(type(daemon), '_setup_schema', return_value=True), \
+             patch.object(type(daemon), '_prepare_insert', return_value=True), \
+             patch.object(type(daemon), '_health_check', return_value=True) as mock_health, \
+             patch.object(type(daemon), '_read_meter', return_value=None) as mock_read, \
+             patch.object(daemon._stop, 'wait', return_value=False) as mock_wait, \
+             patch.object(daemon._http, 'close') as mock_http_close:
 
             daemon.run()
 
-            # Daemon should have exited the loop (db_conn is closed)
-            # The running flag may still be True but loop has exited
-            assert daemon.db_conn is None
+        # Five failed reads (run()'s max_consecutive_failures); every cycle
+        # after the first failure starts with a health check
+        assert mock_read.call_count == 5
+        assert mock_health.call_count == 4
+        assert mock_wait.call_count == 4
+        # The loop was left through cleanup
+        mock_conn.close.assert_called_once()
+        mock_http_close.assert_called_once()
@@ -9,13 +9,18 @@ import sys
 import time
 import json
 import signal
+import threading
 import logging
 import requests
 import psycopg2
+import psycopg2.errors
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from psycopg2 import sql
-from psycopg2.extras import RealDictCursor
-from datetime import datetime, timezone
-from typing import Dict, Optional
+from psycopg2.extras import execute_batch
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 
 # Configure logging
 logging.basicConfig(
@@ -25,28 +30,147 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# TCP keepalives for the long-lived database connection, so a connection
+# silently dropped by a NAT or firewall fails within about a minute instead
+# of blocking the next collection for the OS default timeout
+DB_KEEPALIVES = {
+    "keepalives": 1,
+    "keepalives_idle": 30,
+    "keepalives_interval": 10,
+    "keepalives_count": 3,
+}
+
+# Seconds after a successful insert during which the loop skips the SELECT 1
+# health check; a failed read or insert always triggers one
+HEALTH_CHECK_MAX_AGE = 900
+
+# Bump when _setup_schema() gains new DDL, so existing databases rerun it
+CURRENT_SCHEMA_VERSION = 2
+
+# Idempotent DDL run by _setup_schema(), in order
+_SCHEMA_DDL = (
+    # IF NOT EXISTS, so no need to probe pg_extension first
+    "CREATE EXTENSION IF NOT EXISTS timescaledb",
+    """
+    CREATE TABLE IF NOT EXISTS water_readings (
+        time TIMESTAMPTZ NOT NULL,
+        meter_id TEXT NOT NULL,
+        total_liter_m3 NUMERIC(12,3) NOT NULL,
+        active_liter_lpm NUMERIC(8,3) NOT NULL,
+        wifi_strength INTEGER NOT NULL,
+        wifi_ssid TEXT,
+        total_liter_offset_m3 NUMERIC(12,3),
+        PRIMARY KEY (time, meter_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS maintenance_log (
+        id SERIAL,
+        time TIMESTAMPTZ NOT NULL,
+        meter_id TEXT NOT NULL,
+        maintenance_type TEXT NOT NULL,
+        description TEXT,
+        quantity NUMERIC(10,3),
+        unit TEXT,
+        cost NUMERIC(10,2),
+        notes TEXT,
+        created_by TEXT DEFAULT 'system',
+        PRIMARY KEY (time, id)
+    )
+    """,
+    # Both hypertables in one round-trip; a no-op for existing hypertables
+    """
+    SELECT create_hypertable('water_readings', 'time', if_not_exists => TRUE),
+           create_hypertable('maintenance_log', 'time', if_not_exists => TRUE)
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_water_readings_meter_time ON water_readings (meter_id, time DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_maintenance_log_meter_time ON maintenance_log (meter_id, time DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_maintenance_log_type ON maintenance_log (meter_id, maintenance_type, time DESC)",
+    # Lets maintenance-logger.py's last-salt find the newest salt replacement
+    # with a single index probe
+    """
+    CREATE INDEX IF NOT EXISTS idx_maintenance_log_meter_salt_time ON maintenance_log (meter_id, time DESC)
+    WHERE maintenance_type = 'salt_replacement'
+    """,
+    "CREATE TABLE IF NOT EXISTS schema_meta (version INTEGER PRIMARY KEY)",
+)
+
+# Reading INSERT, prepared once per session by _prepare_insert(); the time
+# column is stamped server-side
+_PREPARE_READING_SQL = """
+    PREPARE ins_reading (text, numeric, numeric, integer, text, numeric) AS
+    INSERT INTO water_readings (
+        time, meter_id, total_liter_m3, active_liter_lpm,
+        wifi_strength, wifi_ssid, total_liter_offset_m3
+    ) VALUES (now(), $1, $2, $3, $4, $5, $6)
+"""
+_INSERT_READING_SQL = "EXECUTE ins_reading (%s, %s, %s, %s, %s, %s)"
+
+
+@lru_cache(maxsize=128)
+def _to_float(value) -> float:
+    """float() with a small cache, meter values repeat while no water flows"""
+    return float(value)
+
+
+@dataclass(frozen=True)
+class Config:
+    """Daemon settings, parsed once from the environment"""
+
+    meter_api_url: str
+    meter_api_timeout: int
+    collection_interval: int
+    meter_id: str
+    db_host: str
+    db_port: int
+    db_name: str
+    db_user: Optional[str]
+    db_password: Optional[str]
+
+    @classmethod
+    def from_env(cls) -> "Config":
+        """Build a Config from environment variables"""
+        return cls(
+            meter_api_url=os.getenv("METER_API_URL", "http://192.168.1.100/api/data"),
+            meter_api_timeout=int(os.getenv("METER_API_TIMEOUT", "10")),
+            collection_interval=int(os.getenv("COLLECTION_INTERVAL", "300")),  # 5 minutes default
+            meter_id=os.getenv("METER_ID", "default_meter"),
+            db_host=os.getenv("DB_HOST", "localhost"),
+            db_port=int(os.getenv("DB_PORT", "5432")),
+            db_name=os.getenv("DB_NAME", "watermeter"),
+            db_user=os.getenv("DB_USER"),
+            db_password=os.getenv("DB_PASSWORD"),
+        )
+
 
 class WaterMeterDaemon:
-    def __init__(self):
+    # Fields a meter reading must contain to be stored
+    _REQUIRED = frozenset(("total_liter_m3", "active_liter_lpm", "wifi_strength"))
+
+    # Settings live on self.config only
+    __slots__ = ("running", "_stop", "db_conn", "_insert_cursor", "_prepared", "config", "_http")
+
+    def __init__(self, config: Optional[Config] = None):
         self.running = False
+        self._stop = threading.Event()
         self.db_conn = None
-
-        # Configuration from environment variables
-        self.meter_api_url = os.getenv("METER_API_URL", "http://192.168.1.100/api/data")
-        self.meter_api_timeout = int(os.getenv("METER_API_TIMEOUT", "10"))
-        self.collection_interval = int(
-            os.getenv("COLLECTION_INTERVAL", "300")
-        )  # 5 minutes default
-        self.meter_id = os.getenv("METER_ID", "default_meter")
-
-        # Database configuration
-        self.db_host = os.getenv("DB_HOST", "localhost")
-        self.db_port = int(os.getenv("DB_PORT", "5432"))
-        self.db_name = os.getenv("DB_NAME", "watermeter")
-        self.db_user = os.getenv("DB_USER")
-        self.db_password = os.getenv("DB_PASSWORD")
-
-        if not self.db_user or not self.db_password:
+        self._insert_cursor = None  # Reused across inserts, see _store_readings_batch()
+        self._prepared = False  # Whether ins_reading exists on the current session
+
+        # Configuration from environment variables unless given
+        self.config = config or Config.from_env()
+
+        # Keep one HTTP connection to the meter open between collections
+        self._http = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=1,
+            max_retries=Retry(total=2, backoff_factor=0.2),
+        )
+        self._http.mount("http://", adapter)
+        self._http.mount("https://", adapter)
+
+        if not self.config.db_user or not self.config.db_password:
             logger.error("DB_USER and DB_PASSWORD environment variables are required")
             sys.exit(1)
 
@@ -55,43 +179,48 @@ class WaterMeterDaemon:
         signal.signal(signal.SIGTERM, self._signal_handler)
 
         logger.info("Water Meter Daemon initialized")
-        logger.info(f"Collection interval: {self.collection_interval} seconds")
-        logger.info(f"Meter API URL: {self.meter_api_url}")
-        logger.info(f"Database: {self.db_host}:{self.db_port}/{self.db_name}")
+        logger.info("Collection interval: %s seconds", self.config.collection_interval)
+        logger.info("Meter API URL: %s", self.config.meter_api_url)
+        logger.info("Database: %s:%s/%s", self.config.db_host, self.config.db_port, self.config.db_name)
 
     def _signal_handler(self, signum, frame):
         """Handle shutdown signals gracefully"""
-        logger.info(f"Received signal {signum}, shutting down...")
+        logger.info("Received signal %s, shutting down...", signum)
         self.running = False
+        # Wake run() if it is waiting for the next collection cycle
+        self._stop.set()
 
     def _connect_database(self) -> bool:
         """Establish database connection, creating database if it doesn't exist"""
+        # A cached cursor and prepared statement belong to the connection being replaced
+        self._drop_insert_cursor()
+        self._prepared = False
         try:
             # First try to connect to the target database
             try:
                 self.db_conn = psycopg2.connect(
-                    host=self.db_host,
-                    port=self.db_port,
-                    database=self.db_name,
-                    user=self.db_user,
-                    password=self.db_password,
-                    cursor_factory=RealDictCursor,
+                    host=self.config.db_host,
+                    port=self.config.db_port,
+                    database=self.config.db_name,
+                    user=self.config.db_user,
+                    password=self.config.db_password,
+                    **DB_KEEPALIVES,
                 )
                 self.db_conn.autocommit = True
-                logger.info(f"Connected to existing database: {self.db_name}")
+                logger.info("Connected to existing database: %s", self.config.db_name)
                 return True
 
             except psycopg2.OperationalError as e:
                 if "database" in str(e) and "does not exist" in str(e):
-                    logger.info(f"Database {self.db_name} does not exist, creating...")
+                    logger.info("Database %s does not exist, creating...", self.config.db_name)
 
                     # Connect to postgres database to create our target database
                     admin_conn = psycopg2.connect(
-                        host=self.db_host,
-                        port=self.db_port,
+                        host=self.config.db_host,
+                        port=self.config.db_port,
                         database="postgres",  # Connect to default postgres db
-                        user=self.db_user,
-                        password=self.db_password,
+                        user=self.config.db_user,
+                        password=self.config.db_password,
                     )
                     admin_conn.autocommit = True
 
@@ -99,154 +228,105 @@ class WaterMeterDaemon:
                         # Create the database using sql.Identifier to prevent SQL injection
                         cursor.execute(
                             sql.SQL('CREATE DATABASE {}').format(
-                                sql.Identifier(self.db_name)
+                                sql.Identifier(self.config.db_name)
                             )
                         )
-                        logger.info(f"Database {self.db_name} created successfully")
+                        logger.info("Database %s created successfully", self.config.db_name)
 
                     admin_conn.close()
 
                     # Now connect to our newly created database
                     self.db_conn = psycopg2.connect(
-                        host=self.db_host,
-                        port=self.db_port,
-                        database=self.db_name,
-                        user=self.db_user,
-                        password=self.db_password,
-                        cursor_factory=RealDictCursor,
+                        host=self.config.db_host,
+                        port=self.config.db_port,
+                        database=self.config.db_name,
+                        user=self.config.db_user,
+                        password=self.config.db_password,
+                        **DB_KEEPALIVES,
                     )
                     self.db_conn.autocommit = True
-                    logger.info(f"Connected to newly created database: {self.db_name}")
+                    logger.info("Connected to newly created database: %s", self.config.db_name)
                     return True
                 else:
                     # Re-raise if it's a different error
                     raise e
 
         except psycopg2.Error as e:
-            logger.error(f"Database connection failed: {e}")
+            logger.error("Database connection failed: %s", e)
             return False
 
     def _setup_schema(self) -> bool:
         """Create the water_readings and maintenance_log tables and hypertables if they don't exist"""
         try:
             with self.db_conn.cursor() as cursor:
-                # Check if TimescaleDB extension exists
-                cursor.execute(
-                    "SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'"
-                )
-                if not cursor.fetchone():
-                    logger.info("Creating TimescaleDB extension...")
-                    cursor.execute("CREATE EXTENSION IF NOT EXISTS timescaledb")
-
-                # Create water_readings table if it doesn't exist
-                create_readings_table_sql = """
-                CREATE TABLE IF NOT EXISTS water_readings (
-                    time TIMESTAMPTZ NOT NULL,
-                    meter_id TEXT NOT NULL,
-                    total_liter_m3 NUMERIC(12,3) NOT NULL,
-                    active_liter_lpm NUMERIC(8,3) NOT NULL,
-                    wifi_strength INTEGER NOT NULL,
-                    wifi_ssid TEXT,
-                    total_liter_offset_m3 NUMERIC(12,3),
-                    PRIMARY KEY (time, meter_id)
-                );
-                """
-                cursor.execute(create_readings_table_sql)
-
-                # Create maintenance_log table if it doesn't exist
-                create_maintenance_table_sql = """
-                CREATE TABLE IF NOT EXISTS maintenance_log (
-                    id SERIAL,
-                    time TIMESTAMPTZ NOT NULL,
-                    meter_id TEXT NOT NULL,
-                    maintenance_type TEXT NOT NULL,
-                    description TEXT,
-                    quantity NUMERIC(10,3),
-                    unit TEXT,
-                    cost NUMERIC(10,2),
-                    notes TEXT,
-                    created_by TEXT DEFAULT 'system',
-                    PRIMARY KEY (time, id)
-                );
-                """
-                cursor.execute(create_maintenance_table_sql)
-
-                # Check if water_readings hypertable already exists
-                cursor.execute(
-                    """
-                    SELECT 1 FROM _timescaledb_catalog.hypertable
-                    WHERE table_name = 'water_readings'
-                """
-                )
-
-                if not cursor.fetchone():
-                    logger.info("Creating water_readings hypertable...")
-                    cursor.execute("SELECT create_hypertable('water_readings', 'time')")
-
-                # Check if maintenance_log hypertable already exists
-                cursor.execute(
-                    """
-                    SELECT 1 FROM _timescaledb_catalog.hypertable
-                    WHERE table_name = 'maintenance_log'
-                """
-                )
+                version = self._schema_version(cursor)
+                if version >= CURRENT_SCHEMA_VERSION:
+                    logger.info("Database schema is up to date (version %s)", version)
+                    return True
 
-                if not cursor.fetchone():
-                    logger.info("Creating maintenance_log hypertable...")
-                    cursor.execute("SELECT create_hypertable('maintenance_log', 'time')")
+                for statement in _SCHEMA_DDL:
+                    cursor.execute(statement)
 
-                # Create indexes for efficient queries
+                # Record the version last, so a failed setup is retried
                 cursor.execute(
-                    """
-                    CREATE INDEX IF NOT EXISTS idx_water_readings_meter_time
-                    ON water_readings (meter_id, time DESC)
-                """
-                )
-
-                cursor.execute(
-                    """
-                    CREATE INDEX IF NOT EXISTS idx_maintenance_log_meter_time
-                    ON maintenance_log (meter_id, time DESC)
-                """
-                )
-
-                cursor.execute(
-                    """
-                    CREATE INDEX IF NOT EXISTS idx_maintenance_log_type
-                    ON maintenance_log (meter_id, maintenance_type, time DESC)
-                """
+                    "INSERT INTO schema_meta (version) VALUES (%s) ON CONFLICT (version) DO NOTHING",
+                    (CURRENT_SCHEMA_VERSION,),
                 )
 
                 logger.info("Database schema setup completed (water_readings and maintenance_log tables)")
                 return True
 
         except psycopg2.Error as e:
-            logger.error(f"Schema setup failed: {e}")
+            logger.error("Schema setup failed: %s", e)
+            return False
+
+    def _schema_version(self, cursor) -> int:
+        """Return the schema version recorded in schema_meta, 0 if none"""
+        try:
+            cursor.execute("SELECT MAX(version) FROM schema_meta")
+        except psycopg2.errors.UndefinedTable:
+            # First run; autocommit means the failed statement needs no rollback
+            return 0
+        row = cursor.fetchone()
+        return row[0] or 0
+
+    def _prepare_insert(self) -> bool:
+        """Prepare the reading INSERT once per database session"""
+        try:
+            with self.db_conn.cursor() as cursor:
+                cursor.execute(_PREPARE_READING_SQL)
+            self._prepared = True
+            return True
+
+        except psycopg2.Error as e:
+            logger.error("Failed to prepare insert statement: %s", e)
             return False
 
     def _read_meter(self) -> Optional[Dict]:
         """Read data from the water meter API"""
         try:
-            response = requests.get(self.meter_api_url, timeout=self.meter_api_timeout)
+            response = self._http.get(self.config.meter_api_url, timeout=self.config.meter_api_timeout)
             response.raise_for_status()
 
             data = response.json()
-            logger.debug(f"Meter reading: {data}")
+            logger.debug("Meter reading: %s", data)
 
-            # Validate required fields
-            required_fields = ["total_liter_m3", "active_liter_lpm", "wifi_strength"]
-            for field in required_fields:
-                if field not in data:
-                    logger.error(f"Missing required field: {field}")
-                    return None
+            # Validate the payload shape and required fields
+            if not isinstance(data, dict):
+                logger.error("Unexpected meter payload: %s", type(data).__name__)
+                return None
+            if not self._REQUIRED <= data.keys():
+                missing = ", ".join(sorted(self._REQUIRED - data.keys()))
+                logger.error("Missing required fields: %s", missing)
+                return None
 
             return data
 
         except requests.RequestException as e:
-            logger.error(f"Failed to read meter: {e}")
+            logger.error("Failed to read meter: %s", e)
             return None
         except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON response from meter: {e}")
+            logger.error("Invalid JSON response from meter: %s", e)
             return None
 
     def _safe_float(self, value, default: float = 0.0) -> float:
@@ -254,54 +334,72 @@ class WaterMeterDaemon:
         if value is None or value == "":
             return default
         try:
-            return float(value)
+            return _to_float(value)
         except (ValueError, TypeError):
-            logger.warning(f"Could not convert '{value}' to float, using default: {default}")
+            logger.warning("Could not convert '%s' to float, using default: %s", value, default)
             return default
 
-    def _store_reading(self, reading_data: Dict) -> bool:
-        """Store a reading in the database"""
+    def _store_readings_batch(self, readings: List[Tuple[str, Dict]]) -> bool:
+        """Store several (meter_id, reading) pairs in one round-trip per page of 100
+
+        All rows share the statement's now() timestamp, so a batch holds at
+        most one reading per meter. The meter_id always comes from the
+        caller, never from the device's JSON.
+        """
+        rows = [
+            (
+                meter_id,
+                _to_float(reading["total_liter_m3"]),
+                _to_float(reading["active_liter_lpm"]),
+                int(reading["wifi_strength"]),
+                reading.get("wifi_ssid"),
+                self._safe_float(reading.get("total_liter_offset_m3"), 0.0),
+            )
+            for meter_id, reading in readings
+        ]
         try:
-            with self.db_conn.cursor() as cursor:
-                insert_sql = """
-                INSERT INTO water_readings (
-                    time, meter_id, total_liter_m3, active_liter_lpm,
-                    wifi_strength, wifi_ssid, total_liter_offset_m3
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s, %s
-                )
-                """
+            if self._insert_cursor is None:
+                self._insert_cursor = self.db_conn.cursor()
+            # ins_reading is prepared by _prepare_insert() for this session
+            execute_batch(self._insert_cursor, _INSERT_READING_SQL, rows, page_size=100)
+            return True
 
-                cursor.execute(
-                    insert_sql,
-                    (
-                        datetime.now(timezone.utc),
-                        self.meter_id,
-                        float(reading_data["total_liter_m3"]),
-                        float(reading_data["active_liter_lpm"]),
-                        int(reading_data["wifi_strength"]),
-                        reading_data.get("wifi_ssid"),
-                        self._safe_float(reading_data.get("total_liter_offset_m3"), 0.0),
-                    ),
-                )
+        except psycopg2.Error as e:
+            logger.error("Failed to store reading: %s", e)
+            # Start over with a fresh cursor on the next insert
+            self._drop_insert_cursor()
+            return False
 
-                logger.info(f"Stored reading: {reading_data['total_liter_m3']} m³")
-                return True
+    def _drop_insert_cursor(self):
+        """Close and forget the cached insert cursor, if any"""
+        cursor, self._insert_cursor = self._insert_cursor, None
+        if cursor is not None:
+            try:
+                cursor.close()
+            except psycopg2.Error:
+                pass
 
-        except psycopg2.Error as e:
-            logger.error(f"Failed to store reading: {e}")
+    def _store_reading(self, reading_data: Dict) -> bool:
+        """Store a reading in the database"""
+        if not self._store_readings_batch([(self.config.meter_id, reading_data)]):
             return False
 
+        logger.info("Stored reading: %s m³", reading_data["total_liter_m3"])
+        return True
+
     def _health_check(self) -> bool:
         """Perform basic health checks"""
         try:
             # Check database connection
             with self.db_conn.cursor() as cursor:
                 cursor.execute("SELECT 1")
-            return True
         except psycopg2.Error:
             logger.warning("Database health check failed, attempting reconnection...")
-            return self._connect_database()
+            # Prepared statements do not survive a new session
+            return self._connect_database() and self._prepare_insert()
+
+        # A reconnect may have succeeded while preparing ins_reading failed
+        return self._prepared or self._prepare_insert()
 
     def run(self):  # noqa: C901
         """Main daemon loop"""
@@ -316,19 +414,25 @@ class WaterMeterDaemon:
             logger.error("Schema setup failed")
             sys.exit(1)
 
+        if not self._prepare_insert():
+            sys.exit(1)
+
         self.running = True
         consecutive_failures = 0
         max_consecutive_failures = 5
+        last_ok = time.monotonic()  # The connection was just set up
 
         while self.running:
             try:
-                # Health check every few iterations
-                if not self._health_check():
+                # A recent successful insert proves the connection is alive
+                needs_check = consecutive_failures or time.monotonic() - last_ok > HEALTH_CHECK_MAX_AGE
+                if needs_check and not self._health_check():
                     consecutive_failures += 1
                     if consecutive_failures >= max_consecutive_failures:
                         logger.error("Too many consecutive failures, exiting")
                         break
-                    time.sleep(30)  # Wait before retry
+                    if self._stop.wait(30):  # Wait before retry
+                        break
                     continue
 
                 # Read meter data
@@ -336,6 +440,7 @@ class WaterMeterDaemon:
                 if reading_data:
                     if self._store_reading(reading_data):
                         consecutive_failures = 0
+                        last_ok = time.monotonic()
                     else:
                         consecutive_failures += 1
                 else:
@@ -345,18 +450,21 @@ class WaterMeterDaemon:
                     logger.error("Too many consecutive failures, exiting")
                     break
 
-                # Wait for next collection cycle
-                if self.running:
-                    time.sleep(self.collection_interval)
+                # Wait for next collection cycle, returns early on shutdown
+                if self._stop.wait(self.config.collection_interval):
+                    break
 
             except Exception as e:
-                logger.error(f"Unexpected error in main loop: {e}")
+                logger.error("Unexpected error in main loop: %s", e)
                 consecutive_failures += 1
-                time.sleep(30)
+                if self._stop.wait(30):
+                    break
 
         # Cleanup
+        self._drop_insert_cursor()
         if self.db_conn:
             self.db_conn.close()
+        self._http.close()
         logger.info("Water Meter Daemon stopped")
 
 